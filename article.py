@@ -0,0 +1,123 @@
+import struct
+import sys
+
+
+class Article:
+    '''Article class
+    Provides a compact model of a news article, parsed once from News API JSON.
+    '''
+
+    __slots__ = ('source_id', 'source', 'author', 'title',
+                 'description', 'url', 'published_at', 'content')
+    header = struct.Struct(f'<{len(__slots__)}i')
+
+    def __init__(self, url, source=None, source_id=None, author=None, title=None,
+                 description=None, published_at=None, content=None):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            url: Link to the article.
+            source: Name of the news source.
+            source_id: ID of the news source.
+            author: Author of the article.
+            title: Headline of the article.
+            description: Summary of the article.
+            published_at: Publication date as an ISO 8601 string.
+            content: Truncated body of the article.
+        '''
+        self.url = url
+        self.source = None if source is None else sys.intern(source)
+        self.source_id = None if source_id is None else sys.intern(source_id)
+        self.author = author
+        self.title = title
+        self.description = description
+        self.published_at = published_at
+        self.content = content
+
+    def __eq__(self, other):
+        '''Compare every field of two articles.
+
+        Args:
+            other: Object to compare with.
+
+        Returns:
+            boolean: The return value. True if other is an article with the same fields.
+        '''
+        return isinstance(other, Article) and all(
+            getattr(self, x) == getattr(other, x) for x in self.__slots__)
+
+    def __hash__(self):
+        '''Hash every field, so equal articles share a hash and articles can be kept in sets and as dictionary keys.
+
+        Returns:
+            int: The return value. Hash of the fields.
+        '''
+        return hash(tuple(getattr(self, x) for x in self.__slots__))
+
+    def __repr__(self):
+        '''Describe the article for debugging.
+
+        Returns:
+            string: The return value. URL and title of the article.
+        '''
+        return f'Article({self.url!r}, title={self.title!r})'
+
+    @classmethod
+    def from_json(cls, obj):
+        '''Build an article from an article object returned by News API.
+
+        Args:
+            obj: Article JSON object.
+
+        Returns:
+            Article: The return value. Parsed article. Unused fields are dropped.
+        '''
+        source = obj.get('source') or {}
+        return cls(obj['url'], source.get('name'), source.get('id'), obj.get('author'), obj.get('title'),
+                   obj.get('description'), obj.get('publishedAt'), obj.get('content'))
+
+    def to_json(self):
+        '''Shape the article like an article object returned by News API.
+
+        Returns:
+            dictionary: The return value. Article JSON object.
+        '''
+        return {'source': {'id': self.source_id, 'name': self.source}, 'author': self.author,
+                'title': self.title, 'description': self.description, 'url': self.url,
+                'publishedAt': self.published_at, 'content': self.content}
+
+    def pack(self):
+        '''Serialize the article into a compact binary record.
+        A header of field lengths is followed by the UTF-8 encoded fields. A length of -1 marks a missing field.
+
+        Returns:
+            bytes: The return value. Packed article.
+        '''
+        values = [getattr(self, x) for x in self.__slots__]
+        data = [b'' if x is None else x.encode() for x in values]
+        lengths = [-1 if x is None else len(y) for x, y in zip(values, data)]
+        return self.header.pack(*lengths) + b''.join(data)
+
+    @classmethod
+    def unpack(cls, data):
+        '''Build an article from a binary record made by Article.pack.
+
+        Args:
+            data: Packed article.
+
+        Returns:
+            Article: The return value. Unpacked article.
+        '''
+        article = cls.__new__(cls)
+        offset = cls.header.size
+        for name, length in zip(cls.__slots__, cls.header.unpack_from(data)):
+            value = None
+            if length >= 0:
+                value = bytes(data[offset:offset + length]).decode()
+                offset += length
+            setattr(article, name, value)
+        if article.source is not None:
+            article.source = sys.intern(article.source)
+        if article.source_id is not None:
+            article.source_id = sys.intern(article.source_id)
+        return article
@@ -0,0 +1,447 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('API_KEY', 'bench')
+
+from article import Article
+from cache import Cache
+from db import DB
+from mock_api import MockAPI
+from news import News, Transport
+
+
+class Bench:
+    '''Bench class
+    Provides latency, throughput and memory benchmarks against a local stand-in for News API.
+    '''
+
+    scenarios = ('search_term', 'get_sources', 'articles', 'auth_user', 'burst')
+    burst_size = 16
+    startup_target = 60
+    footprint_count = 10000
+
+    def __init__(self, iterations, latency, articles, content, cache, cassette=None):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            iterations: Number of timed calls per scenario.
+            latency: Seconds the stand-in waits before each response.
+            articles: Number of articles the stand-in returns per search.
+            content: Length of the content of each article.
+            cache: Whether the on-disk response cache stays enabled.
+            cassette: Cassette recording the stand-in's responses, or replaying them instead of the stand-in. None for neither.
+        '''
+        self.iterations = iterations
+        self.mock = MockAPI(latency=latency, articles=articles, content=content)
+        self.cache = cache
+        self.cassette = cassette
+        self.replaying = cassette is not None and cassette.replaying
+        self.tmp = tempfile.TemporaryDirectory()
+        self.user_id = -1
+        self.sample = []
+        self.pool = None
+
+    def setup(self):
+        '''Point News, Cache and DB at the stand-in server, or the cassette, and a scratch directory.'''
+        import concurrent.futures
+        Transport.cassette = self.cassette
+        if not self.replaying:
+            News.news_url = self.mock.start()
+        if not self.cache:
+            News.cache_ttls = {}
+            News.memo.ttl = 0
+        self.pool = concurrent.futures.ThreadPoolExecutor(self.burst_size)
+        Cache.cache_path = os.path.join(self.tmp.name, 'cache.sqlite')
+        DB.dsn = os.path.join(self.tmp.name, 'db.sqlite')
+        self.user_id = DB.add_user('bench', 'bench')
+        self.sample = News.search_term('sample', '')
+
+    def teardown(self):
+        '''Stop the stand-in server, finish the cassette and remove the scratch directory.'''
+        if not self.replaying:
+            self.mock.stop()
+        if self.cassette is not None:
+            self.cassette.close()
+            Transport.cassette = None
+        self.pool.shutdown()
+        DB.sql_close()
+        self.tmp.cleanup()
+
+    def search_term(self, num):
+        '''Search a distinct term through News.
+
+        Args:
+            num: Number of the call.
+        '''
+        News.search_term(f'term {num}', '')
+
+    def get_sources(self, num):
+        '''Request the sources list through News.
+
+        Args:
+            num: Number of the call.
+        '''
+        News.get_sources()
+
+    def articles(self, num):
+        '''Save an article and list the saved articles.
+
+        Args:
+            num: Number of the call.
+        '''
+        article = Article.unpack(self.sample[num % len(self.sample)].pack())
+        article.url = f'{article.url}?bench={num}'
+        article.title = f'Bench article {num}'
+        article.description = None
+        DB.add_article(self.user_id, article)
+        DB.get_articles(self.user_id)
+
+    def auth_user(self, num):
+        '''Authenticate the benchmark user.
+
+        Args:
+            num: Number of the call.
+        '''
+        DB.auth_user('bench', 'bench')
+
+    def burst(self, num):
+        '''Search the same term from burst_size threads at once, as simultaneous users would.
+
+        Args:
+            num: Number of the call.
+        '''
+        futures = [self.pool.submit(News.search_term, f'Burst {num}', '')
+                   for _ in range(self.burst_size)]
+        for future in futures:
+            future.result()
+
+    @classmethod
+    def percentile(cls, values, pct):
+        '''Find the nearest-rank percentile of the given sorted values.
+
+        Args:
+            values: Sorted list of numbers.
+            pct: Percentile between 0 and 100.
+
+        Returns:
+            float: The return value. Value at the given percentile.
+        '''
+        rank = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+        return values[min(rank, len(values) - 1)]
+
+    def measure(self, name):
+        '''Time a scenario, then run it again under tracemalloc to find its peak memory.
+
+        Args:
+            name: Name of the scenario method.
+
+        Returns:
+            dictionary: The return value. Latency percentiles in milliseconds, throughput per second and peak memory in KiB.
+        '''
+        call = getattr(self, name)
+        call(-1)
+        timings = []
+        start = time.perf_counter()
+        for num in range(self.iterations):
+            began = time.perf_counter()
+            call(num)
+            timings.append((time.perf_counter() - began) * 1000)
+        total = time.perf_counter() - start
+        tracemalloc.start()
+        for num in range(min(self.iterations, 20)):
+            call(self.iterations + num)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        timings.sort()
+        return {'count': len(timings),
+                'p50_ms': round(self.percentile(timings, 50), 3),
+                'p95_ms': round(self.percentile(timings, 95), 3),
+                'p99_ms': round(self.percentile(timings, 99), 3),
+                'throughput_per_s': round(len(timings) / total, 1),
+                'peak_kib': round(peak / 1024, 1)}
+
+    def run(self, names):
+        '''Run the given scenarios.
+
+        Args:
+            names: Names of the scenarios to run.
+
+        Returns:
+            dictionary: The return value. Keys are scenario names. Values are their measurements.
+        '''
+        self.setup()
+        try:
+            results = {name: self.measure(name) for name in names}
+            results['memo'] = News.memo.stats()
+            results['memo']['upstream_requests'] = self.mock.requests
+            return results
+        finally:
+            self.teardown()
+
+    @classmethod
+    def startup(cls, runs, target):
+        '''Measure the start up of the headless entry point with `python -X importtime main.py --help`.
+
+        Args:
+            runs: Number of interpreter launches.
+            target: Maximum allowed p50 import time in milliseconds.
+
+        Returns:
+            dictionary: The return value. Import and wall time percentiles in milliseconds, the slowest modules and whether the target was met.
+        '''
+        root = os.path.dirname(os.path.abspath(__file__))
+        command = [sys.executable, '-X', 'importtime',
+                   os.path.join(root, 'main.py'), '--help']
+        env = dict(os.environ)
+        env.pop('API_KEY', None)
+        imports = []
+        walls = []
+        modules = {}
+        for _ in range(runs):
+            began = time.perf_counter()
+            res = subprocess.run(command, env=env, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.PIPE, universal_newlines=True, check=True)
+            walls.append((time.perf_counter() - began) * 1000)
+            total = 0
+            for line in res.stderr.splitlines():
+                if not line.startswith('import time:') or 'self [us]' in line:
+                    continue
+                own, cumulative, name = line[len('import time:'):].split('|')
+                if not name.startswith('  '):
+                    total += int(cumulative)
+                modules[name.strip()] = modules.get(
+                    name.strip(), 0) + int(own) / runs
+            imports.append(total / 1000)
+        imports.sort()
+        walls.sort()
+        slowest = sorted(modules.items(), key=lambda x: -x[1])[:5]
+        p50 = cls.percentile(imports, 50)
+        return {'count': runs,
+                'p50_ms': round(p50, 3),
+                'p95_ms': round(cls.percentile(imports, 95), 3),
+                'wall_p50_ms': round(cls.percentile(walls, 50), 3),
+                'slowest_self_ms': {x[0]: round(x[1] / 1000, 3) for x in slowest},
+                'target_ms': target,
+                'passed': p50 <= target}
+
+    @classmethod
+    def footprint(cls, count, content):
+        '''Compare the memory held by parsed search results kept as JSON dicts and as Article objects.
+
+        Args:
+            count: Number of articles.
+            content: Length of the content of each article.
+
+        Returns:
+            dictionary: The return value. Traced memory in KiB held by each representation and the sizes of the JSON and packed encodings.
+        '''
+        body = json.dumps(
+            {'articles': MockAPI(articles=count, content=content).articles}).encode()
+        results = {'count': count}
+        for name, parse in (('dict_kib', dict), ('article_kib', Article.from_json)):
+            tracemalloc.start()
+            articles = [parse(x) for x in json.loads(body)['articles']]
+            results[name] = round(tracemalloc.get_traced_memory()[0] / 1024, 1)
+            tracemalloc.stop()
+        results['saved_pct'] = round(
+            100 - results['article_kib'] / results['dict_kib'] * 100, 1)
+        results['json_kib'] = round(len(body) / 1024, 1)
+        results['packed_kib'] = round(
+            sum(len(x.pack()) for x in articles) / 1024, 1)
+        return results
+
+    @classmethod
+    def client(cls, port, seconds, name):
+        '''Send a mix of requests to the JSON API server as one user for the given time. Runs in the client processes.
+
+        Args:
+            port: Port of the server on localhost.
+            seconds: How long to keep sending requests.
+            name: User name to register and log in with.
+
+        Returns:
+            tuple: The return value. Number of requests, number of failed requests and latencies in milliseconds.
+        '''
+        import http.client
+
+        def call(method, path, body=None, token=None):
+            headers = {'Content-Type': 'application/json'}
+            if token is not None:
+                headers['Authorization'] = f'Bearer {token}'
+            conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+            res = conn.getresponse()
+            return res.status, json.loads(res.read())
+
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        credentials = {'username': name, 'password': name}
+        token = call('POST', '/users', credentials)[1]['token']
+        mix = [('GET', f'/search?q=load+{str(i)}', None) for i in range(8)]
+        mix += [('GET', '/sources', None), ('GET', '/saved', None),
+                ('GET', '/trending', None), ('POST', '/session', credentials)]
+        count = failed = 0
+        timings = []
+        until = time.perf_counter() + seconds
+        while time.perf_counter() < until:
+            method, path, body = mix[count % len(mix)]
+            began = time.perf_counter()
+            status = call(method, path, body, token)[0]
+            timings.append((time.perf_counter() - began) * 1000)
+            count += 1
+            failed += status >= 400
+        conn.close()
+        return count, failed, timings
+
+    @classmethod
+    def load(cls, levels, seconds, latency, articles, content):
+        '''Load test the JSON API server with more and more concurrent users, each in a client process of its own.
+        Searches repeat across users, so they are answered from the shared memo, and every twelfth request is a login hashing a password on the worker processes.
+
+        Args:
+            levels: Numbers of concurrent users to measure.
+            seconds: How long to measure each level.
+            latency: Seconds the stand-in waits before each response.
+            articles: Number of articles the stand-in returns per search.
+            content: Length of the content of each article.
+
+        Returns:
+            dictionary: The return value. Requests per second and latency percentiles in milliseconds per level, and the speed up of each level over the first.
+        '''
+        import concurrent.futures
+        import multiprocessing
+        from news import Catalog
+        from server import Server
+        mock = MockAPI(latency=latency, articles=articles, content=content)
+        tmp = tempfile.TemporaryDirectory()
+        News.news_url = mock.start()
+        Cache.cache_path = os.path.join(tmp.name, 'cache.sqlite')
+        Catalog.catalog_path = os.path.join(tmp.name, 'sources.json')
+        DB.dsn = os.path.join(tmp.name, 'db.sqlite')
+        server = Server.serve(0)
+        port = server.server_address[1]
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max(levels), mp_context=multiprocessing.get_context('spawn'))
+        results = {'cpus': os.cpu_count(), 'workers': Server.workers}
+        try:
+            list(pool.map(abs, range(max(levels))))
+            first = None
+            for level in levels:
+                futures = [pool.submit(cls.client, port, seconds, f'load-{str(level)}-{str(i)}')
+                           for i in range(level)]
+                done = [x.result() for x in futures]
+                timings = sorted(y for x in done for y in x[2])
+                rate = sum(x[0] for x in done) / seconds
+                first = first or rate
+                results[f'clients_{str(level)}'] = {
+                    'requests': len(timings),
+                    'failed': sum(x[1] for x in done),
+                    'requests_per_s': round(rate, 1),
+                    'speedup': round(rate / first, 2),
+                    'p50_ms': round(cls.percentile(timings, 50), 3),
+                    'p95_ms': round(cls.percentile(timings, 95), 3),
+                    'p99_ms': round(cls.percentile(timings, 99), 3)}
+            results['memo'] = News.memo.stats()
+            results['memo']['upstream_requests'] = mock.requests
+        finally:
+            pool.shutdown()
+            Server.stop(server)
+            mock.stop()
+            DB.sql_close()
+            tmp.cleanup()
+        return results
+
+    @classmethod
+    def regressions(cls, results, baseline, tolerance):
+        '''Compare results against a baseline run.
+
+        Args:
+            results: Measurements from this run.
+            baseline: Measurements from an earlier run.
+            tolerance: Allowed relative slowdown of p95 latency, e.g. 0.2 for 20%.
+
+        Returns:
+            list: The return value. Descriptions of every scenario that got slower than allowed.
+        '''
+        slower = []
+        for name, res in results.items():
+            if name in baseline and 'p95_ms' in res:
+                limit = baseline[name]['p95_ms'] * (1 + tolerance)
+                if res['p95_ms'] > limit:
+                    slower.append(
+                        f"{name}: p95 {res['p95_ms']}ms > {round(limit, 3)}ms")
+        return slower
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark News and DB against a local stand-in for News API.')
+    parser.add_argument('scenarios', nargs='*', default=list(Bench.scenarios),
+                        help=f"scenarios to run, `startup`, `memory` or `server` (default: {' '.join(Bench.scenarios)})")
+    parser.add_argument('-n', '--iterations', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds the stand-in waits per response')
+    parser.add_argument('--articles', type=int, default=100,
+                        help='articles per search response')
+    parser.add_argument('--content', type=int, default=200,
+                        help='characters of content per article')
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the response cache TTLs enabled')
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument('--record', metavar='CASSETTE',
+                          help="record the stand-in's responses to this cassette file")
+    cassette.add_argument('--replay', metavar='CASSETTE',
+                          help='replay responses from this cassette file instead of the stand-in, waiting --latency each')
+    parser.add_argument('--count', type=int, default=Bench.footprint_count,
+                        help='articles held in memory by the `memory` scenario')
+    parser.add_argument('--startup-target', type=float, default=Bench.startup_target,
+                        help='maximum p50 start up import time in milliseconds')
+    parser.add_argument('--clients', default=','.join(str(2 ** x) for x in range(
+                            (2 * (os.cpu_count() or 1)).bit_length())),
+                        help='comma separated numbers of concurrent users for the `server` scenario')
+    parser.add_argument('--seconds', type=float, default=5,
+                        help='seconds the `server` scenario measures each number of users')
+    parser.add_argument('-o', '--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed p95 slowdown against the baseline')
+    args = parser.parse_args()
+
+    results = {}
+    if 'startup' in args.scenarios:
+        results['startup'] = Bench.startup(
+            min(args.iterations, 20), args.startup_target)
+    if 'memory' in args.scenarios:
+        results['memory'] = Bench.footprint(args.count, args.content)
+    if 'server' in args.scenarios:
+        results['server'] = Bench.load([int(x) for x in args.clients.split(',')], args.seconds,
+                                       args.latency, args.articles, args.content)
+    names = [x for x in args.scenarios if x not in ('startup', 'memory', 'server')]
+    if len(names) > 0:
+        cassette = None
+        if args.record or args.replay:
+            from cassette import Cassette
+            cassette = Cassette(args.record or args.replay, 'record' if args.record else 'replay',
+                                args.latency)
+        bench = Bench(args.iterations, args.latency,
+                      args.articles, args.content, args.cache, cassette)
+        results.update(bench.run(names))
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report + '\n')
+    print(report)
+    if args.baseline:
+        with open(args.baseline) as file:
+            slower = Bench.regressions(results, json.load(file), args.tolerance)
+        for line in slower:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        if slower:
+            sys.exit(1)
+    if 'startup' in results and not results['startup']['passed']:
+        print('REGRESSION startup: import time above target', file=sys.stderr)
+        sys.exit(1)
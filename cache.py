@@ -0,0 +1,139 @@
+import os
+import time
+
+
+class Cache:
+    '''Cache class
+    Provides a persistent, size bounded store for HTTP responses.
+    '''
+
+    cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache.sqlite')
+    max_entries = 500
+    max_bytes = 50 * 1024 * 1024
+    strip_params = ('apiKey',)
+
+    @classmethod
+    def sql_connect(cls):
+        '''Connect to the cache database and make sure the responses table exists.
+
+        Returns:
+            Connection: The return value. Object to perform SQL actions on.
+        '''
+        import sqlite3
+        cnx = sqlite3.connect(cls.cache_path)
+        cnx.execute('CREATE TABLE IF NOT EXISTS responses ('
+                    'key TEXT NOT NULL PRIMARY KEY, '
+                    'body BLOB NOT NULL, '
+                    'etag TEXT, '
+                    'last_modified TEXT, '
+                    'size INTEGER NOT NULL, '
+                    'stored_at REAL NOT NULL, '
+                    'accessed_at REAL NOT NULL)')
+        cnx.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at '
+                    'ON responses (accessed_at)')
+        return cnx
+
+    @classmethod
+    def normalize(cls, url):
+        '''Build a cache key from the given URL.
+        Credentials are stripped and query parameters are sorted so equivalent requests share a key.
+
+        Args:
+            url: Target URL with formatted query string.
+
+        Returns:
+            string: The return value. Normalized URL to use as the cache key.
+        '''
+        import urllib.parse
+        parts = urllib.parse.urlsplit(url)
+        params = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        params = sorted(x for x in params if x[0] not in cls.strip_params)
+        query = urllib.parse.urlencode(params)
+        return urllib.parse.urlunsplit(
+            (parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+    @classmethod
+    def get(cls, key):
+        '''Retrieve the cached response for the given key and mark it as recently used.
+
+        Args:
+            key: Normalized URL of the request.
+
+        Returns:
+            dictionary: The return value. Keys are body, etag, last_modified and stored_at. None if not cached.
+        '''
+        cnx = cls.sql_connect()
+        with cnx:
+            row = cnx.execute('SELECT body, etag, last_modified, stored_at '
+                              'FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                cnx.execute('UPDATE responses SET accessed_at = ? WHERE key = ?',
+                            (time.time(), key))
+        cnx.close()
+        if row is None:
+            return None
+        return {'body': row[0], 'etag': row[1], 'last_modified': row[2], 'stored_at': row[3]}
+
+    @classmethod
+    def put(cls, key, body, etag=None, last_modified=None):
+        '''Store a response for the given key and evict the least recently used entries over the limits.
+
+        Args:
+            key: Normalized URL of the request.
+            body: Raw response body.
+            etag: Value of the ETag response header.
+            last_modified: Value of the Last-Modified response header.
+        '''
+        now = time.time()
+        cnx = cls.sql_connect()
+        with cnx:
+            cnx.execute('INSERT OR REPLACE INTO responses '
+                        '(key, body, etag, last_modified, size, stored_at, accessed_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (key, body, etag, last_modified, len(body), now, now))
+            cls.evict(cnx)
+        cnx.close()
+
+    @classmethod
+    def refresh(cls, key):
+        '''Mark the cached response for the given key as freshly validated.
+
+        Args:
+            key: Normalized URL of the request.
+        '''
+        now = time.time()
+        cnx = cls.sql_connect()
+        with cnx:
+            cnx.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?',
+                        (now, now, key))
+        cnx.close()
+
+    @classmethod
+    def evict(cls, cnx):
+        '''Delete the least recently used entries until the cache is within its entry and size limits.
+
+        Args:
+            cnx: Open connection to the cache database.
+        '''
+        count, size = cnx.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        if count <= cls.max_entries and size <= cls.max_bytes:
+            return
+        rows = cnx.execute(
+            'SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+        stale = []
+        for key, length in rows:
+            if count <= cls.max_entries and size <= cls.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            size -= length
+        cnx.executemany('DELETE FROM responses WHERE key = ?', stale)
+
+    @classmethod
+    def clear(cls):
+        '''Delete every cached response.'''
+        cnx = cls.sql_connect()
+        with cnx:
+            cnx.execute('DELETE FROM responses')
+        cnx.close()
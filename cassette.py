@@ -0,0 +1,198 @@
+import struct
+import threading
+import time
+
+from cache import Cache
+from metrics import Metrics
+
+
+class Cassette:
+    '''Cassette class
+    Provides a file of recorded News API responses, so News can run offline and deterministically.
+    Each response is compressed on its own and found through an open addressing hash index, read through mmap, so replay only decodes the responses it serves.
+    '''
+
+    magic = b'TNSCASS1'
+    header = struct.Struct('<8sQQ')
+    record = struct.Struct('<IId')
+    entry = struct.Struct('<QQ')
+    payload = struct.Struct('<HI')
+    compression = 6
+    drop_headers = ('content-encoding', 'content-length',
+                    'transfer-encoding', 'connection', 'set-cookie')
+    conditional_headers = ('If-None-Match', 'If-Modified-Since')
+
+    def __init__(self, path, mode, latency=0):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            path: Path of the cassette file.
+            mode: Either record, to write a new cassette, or replay.
+            latency: Seconds to wait before serving each replayed response. None to wait as long as the recorded request took.
+        '''
+        self.path = path
+        self.replaying = mode == 'replay'
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.offsets = {}
+        self.slots = 0
+        self.index_offset = 0
+        if self.replaying:
+            import mmap
+            with open(path, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.index_offset, self.slots = self.header.unpack_from(self.map)
+            if magic != self.magic:
+                raise RuntimeError(f'{path} is not a cassette.')
+            if self.index_offset == 0:
+                self.offsets = self.scan()
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(self.header.pack(self.magic, 0, 0))
+
+    @classmethod
+    def key(cls, url):
+        '''Build the key a response is recorded under. The API key and host are dropped, so cassettes replay against any News API URL.
+
+        Args:
+            url: Target URL with formatted query string.
+
+        Returns:
+            bytes: The return value. Endpoint and sorted query string.
+        '''
+        import urllib.parse
+        parts = urllib.parse.urlsplit(Cache.normalize(url))
+        endpoint = parts.path.rstrip('/').rsplit('/', 1)[-1]
+        return f'{endpoint}?{parts.query}'.encode()
+
+    @classmethod
+    def hash(cls, key):
+        '''Hash a key for the index.
+
+        Args:
+            key: Key from Cassette.key.
+
+        Returns:
+            int: The return value. Unsigned 64 bit hash.
+        '''
+        import hashlib
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+    def record_response(self, url, status, headers, body, seconds):
+        '''Append a response to the cassette. A later response to the same request replaces the earlier one.
+
+        Args:
+            url: Requested URL.
+            status: Status code.
+            headers: Response headers.
+            body: Decompressed response body.
+            seconds: Time the request took.
+        '''
+        import zlib
+        key = self.key(url)
+        raw = ''.join(f'{x}: {y}\r\n' for x, y in headers.items()
+                      if x.lower() not in self.drop_headers).encode('latin-1')
+        data = zlib.compress(self.payload.pack(status, len(raw)) + raw + body, self.compression)
+        with self.lock:
+            self.offsets[key] = self.file.tell()
+            self.file.write(self.record.pack(len(key), len(data), seconds) + key + data)
+        Metrics.count('cassette_total', result='recorded')
+
+    def scan(self):
+        '''Index a cassette whose recording was cut short by reading every record.
+
+        Returns:
+            dictionary: The return value. Keys are record keys. Values are record offsets.
+        '''
+        offsets = {}
+        offset = self.header.size
+        while offset + self.record.size <= len(self.map):
+            key_size, data_size, _ = self.record.unpack_from(self.map, offset)
+            start = offset + self.record.size
+            if start + key_size + data_size > len(self.map):
+                break
+            offsets[bytes(self.map[start:start + key_size])] = offset
+            offset = start + key_size + data_size
+        return offsets
+
+    def find(self, key):
+        '''Look up the record of a key in the index, probing from the slot of its hash.
+
+        Args:
+            key: Key from Cassette.key.
+
+        Returns:
+            int: The return value. Record offset. None if the key was not recorded.
+        '''
+        if self.index_offset == 0:
+            return self.offsets.get(key)
+        value = self.hash(key)
+        mask = self.slots - 1
+        slot = value & mask
+        while True:
+            found, offset = self.entry.unpack_from(
+                self.map, self.index_offset + slot * self.entry.size)
+            if offset == 0:
+                return None
+            if found == value:
+                size = self.record.unpack_from(self.map, offset)[0]
+                start = offset + self.record.size
+                if self.map[start:start + size] == key:
+                    return offset
+            slot = (slot + 1) & mask
+
+    def replay(self, url):
+        '''Serve the recorded response to a request, after the configured latency.
+        Raises RuntimeError if the request was not recorded or its record is corrupt.
+
+        Args:
+            url: Requested URL.
+
+        Returns:
+            tuple: The return value. Status code, response headers and decompressed body, as Transport.request returns them.
+        '''
+        import http.client
+        import io
+        import zlib
+        key = self.key(url)
+        offset = self.find(key)
+        if offset is None:
+            Metrics.count('cassette_total', result='miss')
+            raise RuntimeError(f'No recorded response for {key.decode()} in {self.path}.')
+        key_size, data_size, seconds = self.record.unpack_from(self.map, offset)
+        start = offset + self.record.size + key_size
+        try:
+            data = zlib.decompress(self.map[start:start + data_size])
+            status, size = self.payload.unpack_from(data)
+        except (zlib.error, struct.error):
+            Metrics.count('cassette_total', result='corrupt')
+            raise RuntimeError(f'Corrupt recorded response for {key.decode()} in {self.path}.')
+        headers = http.client.parse_headers(
+            io.BytesIO(data[self.payload.size:self.payload.size + size] + b'\r\n'))
+        delay = seconds if self.latency is None else self.latency
+        if delay > 0:
+            time.sleep(delay)
+        Metrics.count('cassette_total', result='hit')
+        return status, headers, data[self.payload.size + size:]
+
+    def close(self):
+        '''Finish the cassette. A recording gets its index written after the records.'''
+        if self.replaying:
+            self.map.close()
+            return
+        with self.lock:
+            slots = 8
+            while slots < 2 * len(self.offsets):
+                slots *= 2
+            table = [(0, 0)] * slots
+            for key, offset in self.offsets.items():
+                value = self.hash(key)
+                slot = value & (slots - 1)
+                while table[slot][1] != 0:
+                    slot = (slot + 1) & (slots - 1)
+                table[slot] = (value, offset)
+            index_offset = self.file.tell()
+            self.file.write(b''.join(self.entry.pack(*x) for x in table))
+            self.file.seek(0)
+            self.file.write(self.header.pack(self.magic, index_offset, slots))
+            self.file.close()
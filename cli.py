@@ -0,0 +1,514 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+
+from db import DB
+from metrics import Metrics
+from news import Catalog, News
+from transfer import Transfer
+from trends import Trends
+from watch import Watch
+
+
+class CLI:
+    '''CLI class
+    Provides the non-interactive command line layer.
+    Results are streamed to stdout as JSON lines.
+    '''
+
+    batch_size = 32
+
+    @classmethod
+    def parser(cls):
+        '''Build the argument parser for the command line interface.
+
+        Returns:
+            ArgumentParser: The return value. Parser with a sub-command for each action.
+        '''
+        parser = argparse.ArgumentParser(
+            prog='main.py', description='Top News Search. Run without arguments for the interactive menu.')
+        parser.add_argument('--db', metavar='DSN',
+                            help='SQLite database path or postgresql:// URI (default: TNS_DB or db.sqlite next to main.py)')
+        parser.add_argument('--hash-target', type=float, metavar='SECONDS',
+                            help='calibrate the password hash cost to take about this long '
+                                 '(default: TNS_HASH_TARGET or a fixed cost)')
+        parser.add_argument('--archive', action='store_true',
+                            help='store every fetched article in the local archive')
+        parser.add_argument('--offline', action='store_true',
+                            help='answer searches from the local archive instead of News API')
+        cassette = parser.add_mutually_exclusive_group()
+        cassette.add_argument('--record', metavar='CASSETTE',
+                              help='record every News API response, without the API key, to this cassette file')
+        cassette.add_argument('--replay', metavar='CASSETTE',
+                              help='serve News API responses from this cassette file instead of the network')
+        parser.add_argument('--replay-latency', type=cls.latency, default=0, metavar='SECONDS',
+                            help='delay before each replayed response, or "recorded" for the recorded durations')
+        parser.add_argument('--profile', nargs='?', const='', metavar='PATH',
+                            help='profile the session with cProfile and tracemalloc, print a summary to stderr '
+                                 'and optionally dump the cProfile statistics to PATH')
+        commands = parser.add_subparsers(dest='command')
+
+        search = commands.add_parser(
+            'search', help='search headlines for terms given as arguments, in a file or on stdin')
+        search.add_argument('terms', nargs='*',
+                            help='terms to search for (default: one per line from --file or stdin)')
+        search.add_argument('-f', '--file', type=argparse.FileType('r'),
+                            help='read terms from this file, one per line')
+        search.add_argument('-s', '--sources', action='append', default=[],
+                            help='comma separated source IDs, repeat for several groups (default: all)')
+        search.add_argument('-c', '--concurrency', type=int, default=News.max_concurrency,
+                            help='maximum requests in flight')
+        search.add_argument('-r', '--rate', type=float, default=News.rate_limit,
+                            help='maximum requests per second')
+        search.add_argument('-b', '--batch', type=int, default=cls.batch_size,
+                            help='terms searched together, duplicates are dropped within a batch')
+        search.set_defaults(action=cls.search)
+
+        sources = commands.add_parser(
+            'sources', help='list available news sources')
+        sources.add_argument('conditions', nargs='*',
+                             help='filters such as category=technology country=us,gb')
+        sources.set_defaults(action=cls.sources)
+
+        trending = commands.add_parser(
+            'trending', help='list terms or sources spiking in recently fetched articles')
+        trending.add_argument('--sources', action='store_true',
+                              help='rank sources instead of terms')
+        trending.add_argument('-n', '--limit', type=int, default=Trends.limit,
+                              help='maximum number of results')
+        trending.set_defaults(action=cls.trending)
+
+        saved = commands.add_parser('saved', help='manage saved articles')
+        saved.add_argument('-u', '--user', required=True,
+                           help='user name (password from TNS_PASSWORD or a prompt)')
+        saved_commands = saved.add_subparsers(dest='saved_command')
+        saved_commands.required = True
+        saved_list = saved_commands.add_parser(
+            'list', help='list saved articles, newest first')
+        saved_list.set_defaults(action=cls.saved_list)
+        saved_add = saved_commands.add_parser(
+            'add', help='save articles read as JSON lines from a file or stdin')
+        saved_add.add_argument('-f', '--file', type=argparse.FileType('r'),
+                               help='read articles from this file')
+        saved_add.set_defaults(action=cls.saved_add)
+        saved_rm = saved_commands.add_parser(
+            'rm', help='remove saved articles by ID')
+        saved_rm.add_argument('ids', nargs='+', type=int,
+                              help='saved article IDs from `saved list`')
+        saved_rm.set_defaults(action=cls.saved_rm)
+
+        export = commands.add_parser(
+            'export', help='export saved articles to a gzip compressed JSON lines file')
+        export.add_argument('-u', '--user', required=True,
+                            help='user name (password from TNS_PASSWORD or a prompt)')
+        export.add_argument('path', help='file to write, - for stdout')
+        export.add_argument('--format', choices=Transfer.formats, default='rows',
+                            help='one article per line, or one chunk per line as a list of values per field')
+        export.set_defaults(action=cls.export)
+
+        load = commands.add_parser(
+            'import', help='save articles from an export file or JSON lines, compressed or not')
+        load.add_argument('-u', '--user', required=True,
+                          help='user name (password from TNS_PASSWORD or a prompt)')
+        load.add_argument('path', help='file to read, - for stdin')
+        load.add_argument('-w', '--workers', type=int, default=Transfer.workers,
+                          help='processes decoding and validating lines')
+        load.set_defaults(action=cls.load)
+
+        watch = commands.add_parser('watch', help='manage watched searches')
+        watch.add_argument('-u', '--user', required=True,
+                           help='user name (password from TNS_PASSWORD or a prompt)')
+        watch_commands = watch.add_subparsers(dest='watch_command')
+        watch_commands.required = True
+        watch_list = watch_commands.add_parser(
+            'list', help='list watched searches')
+        watch_list.set_defaults(action=cls.watch_list)
+        watch_add = watch_commands.add_parser('add', help='watch a search')
+        watch_add.add_argument('term', help='term to search for')
+        watch_add.add_argument('-s', '--sources', default='',
+                               help='comma separated source IDs (default: all)')
+        watch_add.add_argument('-i', '--interval', type=float, default=Watch.interval / 60,
+                               help='minutes between polls')
+        watch_add.set_defaults(action=cls.watch_add)
+        watch_rm = watch_commands.add_parser(
+            'rm', help='stop watching searches by ID')
+        watch_rm.add_argument('ids', nargs='+', type=int,
+                              help='watch IDs from `watch list`')
+        watch_rm.set_defaults(action=cls.watch_rm)
+        watch_new = watch_commands.add_parser(
+            'new', help='list articles found since they were last listed')
+        watch_new.add_argument('-a', '--all', action='store_true',
+                               help='include articles listed before')
+        watch_new.set_defaults(action=cls.watch_new)
+
+        poll = commands.add_parser(
+            'poll', help='poll watched searches of every user as they fall due and stream new articles')
+        poll.add_argument('--once', action='store_true',
+                          help='poll the due watches once and exit')
+        poll.add_argument('--metrics-port', type=int,
+                          help='serve metrics at /metrics (Prometheus) and /metrics.json on this port')
+        poll.set_defaults(action=cls.poll)
+
+        serve = commands.add_parser(
+            'serve', help='serve search, sources, sessions and saved articles to many users as a JSON API over HTTP')
+        serve.add_argument('-p', '--port', type=int, default=8080,
+                           help='port to listen on (default: 8080)')
+        serve.add_argument('--host', default='127.0.0.1',
+                           help='address to listen on (default: 127.0.0.1)')
+        serve.add_argument('-t', '--threads', type=int,
+                           help='connections answered at once (default: 32)')
+        serve.add_argument('-w', '--workers', type=int,
+                           help='password hash worker processes (default: one per CPU)')
+        serve.set_defaults(action=cls.serve)
+        return parser
+
+    @classmethod
+    def latency(cls, value):
+        '''Parse the replay latency argument.
+
+        Args:
+            value: Seconds, or recorded.
+
+        Returns:
+            float: The return value. Seconds. None to replay the recorded durations.
+        '''
+        return None if value == 'recorded' else float(value)
+
+    @classmethod
+    def write(cls, obj):
+        '''Write the given object to stdout as a single JSON line.
+
+        Args:
+            obj: JSON serializable object.
+        '''
+        sys.stdout.write(json.dumps(obj) + '\n')
+
+    @classmethod
+    def read_lines(cls, file):
+        '''Lazily read non-blank lines that are not comments from the given file.
+
+        Args:
+            file: Open text file.
+
+        Yields:
+            string: Stripped line.
+        '''
+        for _, line in cls.read_numbered(file):
+            yield line
+
+    @classmethod
+    def read_numbered(cls, file):
+        '''Lazily read non-blank lines that are not comments from the given file, along with their line numbers.
+
+        Args:
+            file: Open text file.
+
+        Yields:
+            tuple: Line number, starting at 1, and stripped line.
+        '''
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if line != '' and not line.startswith('#'):
+                yield number, line
+
+    @classmethod
+    def search(cls, args):
+        '''Search the terms batch by batch across all source groups and stream each unique article as a JSON line.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        import asyncio
+        terms = iter(args.terms) if args.terms else cls.read_lines(
+            args.file or sys.stdin)
+        News.max_concurrency = args.concurrency
+        News.rate_limit = args.rate
+        if args.archive and not args.offline:
+            DB.prune_archive()
+        batch = list(itertools.islice(terms, args.batch))
+        while len(batch) > 0:
+            if args.offline:
+                sources = [z for x in args.sources
+                           for y in News.chunk_sources(x) for z in y]
+                for article in News.merge(DB.search_archive(x, sources) for x in batch):
+                    cls.write(article.to_json())
+            else:
+                asyncio.run(cls.stream(batch, args.sources, args.archive))
+            batch = list(itertools.islice(terms, args.batch))
+
+    @classmethod
+    async def stream(cls, terms, source_groups, archive):
+        '''Write articles as their searches complete.
+
+        Args:
+            terms: Target terms to search for within articles.
+            source_groups: Lists or comma separated strings of news source IDs.
+            archive: Whether to store the articles in the local archive.
+        '''
+        articles = []
+        async for article in News.stream_many(terms, source_groups):
+            cls.write(article.to_json())
+            articles.append(article)
+        Trends.ingest(articles)
+        if archive:
+            DB.archive_articles(articles)
+
+    @classmethod
+    def sources(cls, args):
+        '''Stream each available source matching the filters as a JSON line.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        sources = Catalog.load()
+        if len(args.conditions) > 0:
+            try:
+                ids = Catalog.select(' '.join(args.conditions))
+            except ValueError as err:
+                sys.exit(str(err))
+            sources = [x for x in sources if x['id'] in ids]
+        for source in sources:
+            cls.write(source)
+
+    @classmethod
+    def trending(cls, args):
+        '''Stream the most spiking terms or sources as JSON lines.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        kind = 'source' if args.sources else 'term'
+        for name, recent, expected, ratio in Trends.trending(kind, args.limit):
+            cls.write({kind: name, 'recent': recent, 'expected': round(expected, 2),
+                       'ratio': round(ratio, 2)})
+
+    @classmethod
+    def login(cls, args):
+        '''Authenticate the user named on the command line.
+
+        Args:
+            args: Parsed command line arguments.
+
+        Returns:
+            int: The return value. User ID. Exits if the credentials are invalid.
+        '''
+        import getpass
+        password = os.environ.get('TNS_PASSWORD')
+        if password is None:
+            password = getpass.getpass('Enter password:')
+        user_id = DB.auth_user(args.user, password)
+        if user_id == -1:
+            sys.exit('Invalid credentials.')
+        return user_id
+
+    @classmethod
+    def saved_list(cls, args):
+        '''Stream the user's saved articles as JSON lines, each with its saved article ID.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        user_id = cls.login(args)
+        for article_id, article in DB.iter_articles(user_id):
+            cls.write({'id': article_id, **article.to_json()})
+
+    @classmethod
+    def saved_add(cls, args):
+        '''Save articles read as JSON lines, committing one batch at a time, and write how many were added and skipped as near duplicates.
+        Invalid lines are reported on stderr and skipped, and the command fails once every valid line is saved.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        user_id = cls.login(args)
+        lines = cls.read_numbered(args.file or sys.stdin)
+        added = skipped = invalid = 0
+        batch = list(itertools.islice(lines, cls.batch_size * 32))
+        while len(batch) > 0:
+            articles = []
+            for number, line in batch:
+                try:
+                    article = Transfer.validate(json.loads(line))
+                    if not article.title:
+                        raise ValueError('missing title')
+                    articles.append(article)
+                except (ValueError, KeyError, TypeError) as err:
+                    print(f'Line {str(number)}: {err}', file=sys.stderr)
+                    invalid += 1
+            count = DB.add_articles(user_id, articles)
+            added += count
+            skipped += len(articles) - count
+            batch = list(itertools.islice(lines, cls.batch_size * 32))
+        cls.write({'added': added, 'skipped': skipped, 'invalid': invalid})
+        if invalid > 0:
+            raise RuntimeError(f'{str(invalid)} invalid lines')
+
+    @classmethod
+    def saved_rm(cls, args):
+        '''Remove the given saved articles of the user.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        user_id = cls.login(args)
+        with DB.transaction():
+            for article_id in args.ids:
+                DB.delete_article(article_id, user_id)
+
+    @classmethod
+    def export(cls, args):
+        '''Export the user's saved articles and write how many were exported.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        user_id = cls.login(args)
+        if args.path == '-':
+            count = Transfer.export(user_id, sys.stdout.buffer, args.format)
+        else:
+            with open(args.path, 'wb') as file:
+                count = Transfer.export(user_id, file, args.format)
+        print(json.dumps({'exported': count}), file=sys.stderr if args.path == '-' else sys.stdout)
+
+    @classmethod
+    def load(cls, args):
+        '''Import saved articles for the user, reporting invalid lines on stderr, and write how many were saved.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        def error(number, message):
+            print(f'Line {str(number)}: {message}', file=sys.stderr)
+
+        user_id = cls.login(args)
+        if args.path == '-':
+            read, saved, invalid = Transfer.load(user_id, sys.stdin.buffer, args.workers, error)
+        else:
+            with open(args.path, 'rb') as file:
+                read, saved, invalid = Transfer.load(user_id, file, args.workers, error)
+        cls.write({'read': read, 'saved': saved, 'invalid': invalid})
+
+    @classmethod
+    def watch_list(cls, args):
+        '''Stream the user's watched searches as JSON lines.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        user_id = cls.login(args)
+        for watch in DB.get_watches(user_id):
+            cls.write({'id': watch[0], 'term': watch[1], 'sources': watch[2],
+                       'interval': watch[3] / 60, 'unseen': watch[4]})
+
+    @classmethod
+    def watch_add(cls, args):
+        '''Watch a search for the user and write the new watch ID.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        sources = [x.strip() for x in args.sources.split(',') if x.strip()]
+        if len(sources) > News.max_sources:
+            sys.exit(f'At most {News.max_sources} sources can be watched.')
+        user_id = cls.login(args)
+        watch_id = DB.add_watch(user_id, args.term, sources,
+                                max(args.interval * 60, Watch.min_interval))
+        if watch_id == -1:
+            sys.exit('Search already watched.')
+        cls.write({'id': watch_id})
+
+    @classmethod
+    def watch_rm(cls, args):
+        '''Stop watching the given searches of the user.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        user_id = cls.login(args)
+        for watch_id in args.ids:
+            DB.delete_watch(watch_id, user_id)
+
+    @classmethod
+    def watch_new(cls, args):
+        '''Stream the articles found by the user's watches as JSON lines and mark them as seen.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        user_id = cls.login(args)
+        found = DB.watch_articles(user_id, not args.all)
+        for found_id, term, article in found:
+            cls.write({'id': found_id, 'term': term, **article.to_json()})
+        DB.mark_seen(user_id, [x[0] for x in found])
+
+    @classmethod
+    def poll(cls, args):
+        '''Poll watched searches until interrupted, writing each new article as a JSON line.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        import signal
+        import threading
+
+        def write(watch_id, user_id, article):
+            cls.write({'watch': watch_id, 'user': user_id, **article.to_json()})
+            sys.stdout.flush()
+
+        if args.metrics_port is not None:
+            Metrics.serve(args.metrics_port)
+        if args.once:
+            for found in Watch.poll():
+                write(*found)
+            return
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            Watch.run(stop, write)
+        except KeyboardInterrupt:
+            pass
+
+    @classmethod
+    def serve(cls, args):
+        '''Serve the JSON API until interrupted.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        import signal
+        import threading
+        from server import Server
+        Server.archive = args.archive
+        Server.offline = args.offline
+        if args.archive and not args.offline:
+            DB.prune_archive()
+        server = Server.serve(args.port, args.host, args.threads, args.workers)
+        host, port = server.server_address[:2]
+        print(f'Serving on http://{host}:{str(port)}/', file=sys.stderr)
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            while not stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            Server.stop(server)
+
+    @classmethod
+    def run(cls, args):
+        '''Entry point for the command line interface.
+
+        Args:
+            args: Parsed command line arguments.
+        '''
+        try:
+            args.action(args)
+            sys.stdout.flush()
+        except RuntimeError as err:
+            sys.exit(str(err))
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
@@ -0,0 +1,237 @@
+import operator
+import re
+import struct
+
+
+class Dedup:
+    '''Dedup class
+    Provides URL canonicalization and MinHash clustering of near duplicate articles.
+    '''
+
+    tracking_params = ('fbclid', 'gclid', 'mc_cid', 'mc_eid',
+                       'cmpid', 'ocid', 'smid', 'ref', 'rss')
+    tracking_prefixes = ('utm_',)
+    permutations = 32
+    rows = 4
+    min_similarity = 0.7
+    max_candidates = 8
+    max_words = 100000
+    words = {}
+    word_pattern = re.compile(r'\w+')
+    signature = struct.Struct(f'<{permutations}H')
+    band = struct.Struct(f'<B{rows}H')
+    band_key = struct.Struct('<q')
+
+    @classmethod
+    def canonical_url(cls, url):
+        '''Reduce the given article URL to a form shared by every link to the same page.
+        The scheme, a leading www., the fragment, trailing slashes and tracking parameters are dropped and the remaining parameters are sorted.
+        A link that does not parse is kept as it is, and a port that does not parse is dropped.
+
+        Args:
+            url: Link to an article.
+
+        Returns:
+            string: The return value. Canonical URL.
+        '''
+        import urllib.parse
+        try:
+            parts = urllib.parse.urlsplit(url.strip())
+        except ValueError:
+            return url.strip()
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        host = (parts.hostname or '').lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        if port is not None and port not in (80, 443):
+            host = f'{host}:{port}'
+        params = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        params = sorted(x for x in params if x[0].lower() not in cls.tracking_params
+                        and not x[0].lower().startswith(cls.tracking_prefixes))
+        path = parts.path.rstrip('/')
+        query = urllib.parse.urlencode(params)
+        return f'{host}{path}?{query}' if query else f'{host}{path}'
+
+    @classmethod
+    def hashes(cls, word):
+        '''Hash the given word once per MinHash permutation.
+
+        Args:
+            word: Lower case word.
+
+        Returns:
+            tuple: The return value. One 16 bit hash per permutation.
+        '''
+        hashes = cls.words.get(word)
+        if hashes is None:
+            import hashlib
+            digest = hashlib.blake2b(
+                word.encode(), digest_size=cls.signature.size).digest()
+            hashes = cls.signature.unpack(digest)
+            if len(cls.words) >= cls.max_words:
+                cls.words.clear()
+            cls.words[word] = hashes
+        return hashes
+
+    @classmethod
+    def fingerprint(cls, text):
+        '''Compute the MinHash signature of the set of words in the given text.
+        The share of positions where two signatures agree estimates how many words the texts share.
+
+        Args:
+            text: Text to fingerprint.
+
+        Returns:
+            tuple: The return value. Smallest hash of any word for each permutation. None for text without words.
+        '''
+        words = set(cls.word_pattern.findall(text.lower()))
+        if len(words) == 0:
+            return None
+        return tuple(map(min, zip(*map(cls.hashes, words))))
+
+    @classmethod
+    def text(cls, article):
+        '''Pick the text of the given article used for near duplicate detection.
+
+        Args:
+            article: Target article.
+
+        Returns:
+            string: The return value. Title and description.
+        '''
+        return f'{article.title or ""} {article.description or ""}'
+
+    @classmethod
+    def keys(cls, article):
+        '''Compute the canonical URL and fingerprint of the given article.
+
+        Args:
+            article: Target article.
+
+        Returns:
+            tuple: The return value. Canonical URL and fingerprint.
+        '''
+        return cls.canonical_url(article.url), cls.fingerprint(cls.text(article))
+
+    @classmethod
+    def similarity(cls, first, second):
+        '''Estimate the share of words two texts have in common from their fingerprints.
+
+        Args:
+            first: Fingerprint.
+            second: Fingerprint.
+
+        Returns:
+            float: The return value. Estimated Jaccard similarity between 0 and 1.
+        '''
+        return sum(map(operator.eq, first, second)) / cls.permutations
+
+    @classmethod
+    def pack(cls, fingerprint):
+        '''Serialize the given fingerprint for storage.
+
+        Args:
+            fingerprint: Fingerprint or None.
+
+        Returns:
+            bytes: The return value. Packed fingerprint. None if the fingerprint is None.
+        '''
+        return None if fingerprint is None else cls.signature.pack(*fingerprint)
+
+    @classmethod
+    def unpack(cls, data):
+        '''Read a fingerprint made by Dedup.pack.
+
+        Args:
+            data: Packed fingerprint or None.
+
+        Returns:
+            tuple: The return value. Fingerprint. None if the data is None.
+        '''
+        return None if data is None else cls.signature.unpack(data)
+
+    @classmethod
+    def bands(cls, fingerprint):
+        '''Key each band of rows hashes of a fingerprint, so fingerprints sharing a band share a key and can be found by an index.
+
+        Args:
+            fingerprint: Fingerprint or None.
+
+        Returns:
+            list: The return value. Signed 64 bit key of each band. Empty if the fingerprint is None.
+        '''
+        if fingerprint is None:
+            return []
+        import hashlib
+        return [cls.band_key.unpack(hashlib.blake2b(
+            cls.band.pack(start, *fingerprint[start:start + cls.rows]), digest_size=8).digest())[0]
+            for start in range(0, cls.permutations, cls.rows)]
+
+    @classmethod
+    def labels(cls, keys, known=0):
+        '''Label items so duplicates share a label, in a single pass over the items.
+        Items are duplicates if their canonical URLs match or their fingerprints are at least min_similarity alike.
+        Fingerprints are split into bands of rows hashes, and each item is compared with at most max_candidates earlier items per band it shares, so the work grows linearly with the items.
+
+        Args:
+            keys: List of tuples of canonical URL and fingerprint.
+            known: Number of leading items already known to be distinct. They are indexed but not compared with each other.
+
+        Returns:
+            list: The return value. For each item, the index of the first item of its group.
+        '''
+        parents = list(range(len(keys)))
+
+        def find(i):
+            while parents[i] != i:
+                parents[i] = parents[parents[i]]
+                i = parents[i]
+            return i
+
+        def union(i, j):
+            i, j = find(i), find(j)
+            if i != j:
+                parents[max(i, j)] = min(i, j)
+
+        urls = {}
+        prints = {}
+        buckets = {}
+        for i, (url, fingerprint) in enumerate(keys):
+            union(i, urls.setdefault(url, i))
+            if fingerprint is None:
+                continue
+            if fingerprint in prints:
+                union(i, prints[fingerprint])
+                continue
+            prints[fingerprint] = i
+            for start in range(0, cls.permutations, cls.rows):
+                bucket = buckets.setdefault(
+                    (start, fingerprint[start:start + cls.rows]), [])
+                if i >= known:
+                    for j in bucket[-cls.max_candidates:]:
+                        if find(i) != find(j) and cls.similarity(fingerprint, keys[j][1]) >= cls.min_similarity:
+                            union(i, j)
+                bucket.append(i)
+        return [find(i) for i in range(len(keys))]
+
+    @classmethod
+    def cluster(cls, articles):
+        '''Group the given articles into stories. Articles linking to the same page are dropped.
+
+        Args:
+            articles: List of articles.
+
+        Returns:
+            list: The return value. Lists of articles in order of first appearance. The first article of each list leads the story.
+        '''
+        keys = [cls.keys(x) for x in articles]
+        groups = {}
+        urls = set()
+        for article, key, label in zip(articles, keys, cls.labels(keys)):
+            if key[0] not in urls:
+                urls.add(key[0])
+                groups.setdefault(label, []).append(article)
+        return list(groups.values())
@@ -1,9 +1,15 @@
-import getpass
-import pickle
+import itertools
+import sys
+import time
 
 from db import DB
+from dedup import Dedup
+from metrics import Metrics
 from menu import Menu
-from news import News
+from news import Catalog, News, Transport
+from session import Session
+from trends import Trends
+from watch import Watch
 
 
 class Main(Menu):
@@ -12,27 +18,39 @@ class Main(Menu):
     Inherits from Menu class.
     '''
 
-    user_id = -1
-    source_ids = ''
+    archive = False
+    offline = False
+    offline_limit = 1000
+
+    def __init__(self, session=None):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            session: State of the user's session. None to start logged out with all sources.
+        '''
+        self.session = session or Session()
 
     def main_menu(self):
         '''Display the main menu.'''
-        if self.user_id != -1:
+        if self.session.user_id != -1:
             options = '[1] News sources\n'\
                       '[2] Search articles\n'\
                       '[3] View saved articles\n'\
                       '[4] Logout\n'\
+                      '[5] Watchlist\n'\
+                      '[6] Trending\n'\
                       '[0] Quit\n'
         else:
             options = '[1] News sources\n'\
                       '[2] Search articles\n'\
                       '[3] Login\n'\
+                      '[6] Trending\n'\
                       '[0] Quit\n'
         return self.create_menu('MENU', options)
 
     def sources_menu(self):
         '''Display the sources menu.'''
-        sources = News.get_sources()
+        sources = Catalog.load()
         print(f'{str(len(sources))} sources available!')
         action = None
         while action != 0:
@@ -41,75 +59,118 @@ class Main(Menu):
                       '[0] Go back\n'
             action = self.create_menu('SOURCES', options)
             if action == 1:
-                [print(f"[{str(i + 1)}] {source['name']}")
-                 for i, source in sources.items()]
-                selection = 'All' if self.source_ids == '' else [
-                    sources[i]['name'] for i in sources if sources[i]['id'] in self.source_ids]
+                self.pager('SOURCES', sources,
+                           lambda i, source: f"[{str(i + 1)}] {source['name']}")
+                selection = 'All' if len(self.session.source_ids) == 0 else Catalog.names(
+                    self.session.source_ids)
                 print(
                     f'\n{self.Fore.YELLOW}{self.Style.BRIGHT}Current sources: {selection}{self.Style.RESET_ALL}')
             elif action == 2:
                 new_ids = ''
                 while new_ids == '':
                     new_ids = self.yellow_input(
-                        'Enter comma separated list of source #s (or `All`)')
+                        'Enter comma separated list of source #s, a filter like `category=technology country=us` (or `All`)')
                     print(self.Style.RESET_ALL)
                 if new_ids.lower() == 'all':
-                    self.source_ids = ''
+                    self.session.source_ids = frozenset()
                     self.success('Sources set!')
                 else:
                     try:
-                        new_ids = set(map(int, new_ids.split(',')))
-                        new_ids = [sources[i - 1]['id'] for i in new_ids]
+                        if '=' in new_ids:
+                            new_ids = Catalog.select(new_ids)
+                        else:
+                            new_ids = {sources[i - 1]['id']
+                                       for i in map(int, new_ids.split(',')) if i > 0}
+                        if len(new_ids) == 0:
+                            raise ValueError('No sources selected.')
                     except:
                         self.error(self.INVALID)
                         continue
-                    self.source_ids = new_ids
-                    self.success('Sources set!')
+                    self.session.source_ids = frozenset(new_ids)
+                    self.success(f'{str(len(new_ids))} sources set!')
             elif action == 0:
                 break
             else:
                 self.error(self.INVALID)
 
-    def articles_menu(self):
-        '''Display the article search menu.'''
-        term = ''
+    def articles_menu(self, term=''):
+        '''Display the article search menu.
+
+        Args:
+            term: Term to search for. Empty to ask for one.
+        '''
         while term == '':
             term = self.yellow_input('Enter a term')
             print(self.Style.RESET_ALL)
-        articles = News.search_term(term, self.source_ids)
+        print('Searching...')
+        began = time.perf_counter()
+        if self.offline:
+            results = iter(DB.search_archive(
+                term, self.session.source_ids, self.offline_limit))
+        else:
+            results = News.iter_articles(term, self.session.source_ids)
+        articles = list(itertools.islice(results, News.page_size))
+        more = len(articles) == News.page_size
+        self.record_articles(articles)
+        stories = Dedup.cluster(articles)
+        elapsed = time.perf_counter() - began
+        Metrics.observe('search_seconds', elapsed,
+                        mode='offline' if self.offline else 'online')
         if len(articles) > 0:
-            print(f'{str(len(articles))} results!')
+            print(f'{str(len(stories))} stories from {str(len(articles))} results in {elapsed:.2f}s!')
             action = None
             while action != 0:
                 options = '[1] View results\n'\
-                          '[2] Choose article\n'\
-                          '[0] Go back\n'
+                          '[2] Choose article\n'
+                if more:
+                    options += '[3] Load more results\n'
+                options += '[0] Go back\n'
                 action = self.create_menu('RESULTS', options)
                 if action == 1:
-                    [print(f"[{str(i + 1)}] {article['title']}")
-                     for i, article in articles.items()]
+                    self.pager('RESULTS', stories,
+                               lambda i, story: f"[{str(i + 1)}] {story[0].title}" +
+                               (f'\n    +{str(len(story) - 1)} similar' if len(story) > 1 else ''))
+                elif action == 3 and more:
+                    began = time.perf_counter()
+                    page = list(itertools.islice(results, News.page_size))
+                    more = len(page) == News.page_size
+                    articles.extend(page)
+                    self.record_articles(page)
+                    stories = Dedup.cluster(articles)
+                    elapsed = time.perf_counter() - began
+                    if len(page) > 0:
+                        print(f'{str(len(stories))} stories from {str(len(articles))} results in {elapsed:.2f}s!')
+                    else:
+                        self.error('No more results.')
                 elif action == 2:
                     article = self.yellow_input('Enter the article #')
                     print(self.Style.RESET_ALL)
                     try:
                         article = int(article)
-                        article = articles[article - 1]
+                        if article < 1:
+                            raise IndexError(article)
+                        story = stories[article - 1]
                     except:
                         self.error(self.INVALID)
                         continue
+                    article = story[0]
                     self.show_details(article)
+                    if len(story) > 1:
+                        print(
+                            f"{self.Decor.UNDERLINE}ALSO IN{self.Style.RESET_ALL}: {self.truncate(', '.join(x.source or x.url for x in story[1:]), self.max_field)}")
                     while action != 0:
-                        if self.user_id != -1:
+                        if self.session.user_id != -1:
                             options = '[1] Save article\n'\
                                       '[0] Go back\n'
                         else:
                             options = '[0] Go back\n'
                         action = self.create_menu('ARTICLE', options)
                         if action == 1:
-                            if self.user_id != -1:
-                                res = pickle.dumps(article)
-                                DB.add_article(self.user_id, res)
-                                self.success('Article saved!')
+                            if self.session.user_id != -1:
+                                if DB.add_article(self.session.user_id, article):
+                                    self.success('Article saved!')
+                                else:
+                                    self.error('Already saved.')
                                 break
                             else:
                                 self.error(self.INVALID)
@@ -125,34 +186,93 @@ class Main(Menu):
         else:
             self.error('No results.')
 
+    def record_articles(self, articles):
+        '''Count fetched articles into the trends and store them in the local archive when archiving is enabled.
+
+        Args:
+            articles: List of articles.
+        '''
+        if self.offline or len(articles) == 0:
+            return
+        Trends.ingest(articles)
+        if self.archive:
+            DB.archive_articles(articles)
+
+    def trending_menu(self):
+        '''Display the trending menu.'''
+        action = None
+        while action != 0:
+            options = '[1] Trending terms\n'\
+                      '[2] Trending sources\n'\
+                      '[3] Search a trending term\n'\
+                      '[0] Go back\n'
+            action = self.create_menu('TRENDING', options)
+            if action in (1, 2):
+                trends = Trends.trending(Trends.kinds[action - 1])
+                if len(trends) > 0:
+                    self.pager('TRENDING', trends, lambda i, x: f'[{str(i + 1)}] {x[0]}: {str(x[1])} articles '
+                               f'in {str(Trends.recent_hours)}h, {x[3]:.1f}x usual')
+                else:
+                    self.error('Nothing trending yet. Search for some articles first.')
+            elif action == 3:
+                trends = Trends.trending('term')
+                choice = self.yellow_input('Enter the trending term #')
+                print(self.Style.RESET_ALL)
+                try:
+                    term = trends[int(choice) - 1][0]
+                except (ValueError, IndexError):
+                    self.error(self.INVALID)
+                    continue
+                self.articles_menu(term)
+            elif action == 0:
+                break
+            else:
+                self.error(self.INVALID)
+
     def saved_menu(self):
-        '''Display the saved articles menu.'''
+        '''Display the saved articles menu. Articles are read from the database only as far as they are shown.'''
         new = True
         action = None
+        ids = None
         while action != 0:
-            articles = DB.get_articles(self.user_id)
-            ids = {i: articles[i][0] for i in articles}
-            articles = {i: pickle.loads(articles[i][1]) for i in articles}
-            if len(articles) > 0:
+            if ids is None:
+                ids = DB.saved_ids(self.session.user_id)
+            if len(ids) > 0:
                 if new:
-                    print(f'{str(len(articles))} saved!')
+                    print(f'{str(len(ids))} saved!')
                     new = False
                 options = '[1] View saved\n'\
                           '[2] Choose article\n'\
+                          '[3] Search saved\n'\
                           '[0] Go back\n'
                 action = self.create_menu('SAVED', options)
                 if action == 1:
-                    [print(f"[{str(i + 1)}] {article['title']}")
-                     for i, article in articles.items()]
+                    self.pager('SAVED', DB.iter_articles(self.session.user_id),
+                               lambda i, x: f"[{str(i + 1)}] {x[1].title}")
+                elif action == 3:
+                    query = ''
+                    while query.strip() == '':
+                        query = self.yellow_input('Enter search words')
+                        print(self.Style.RESET_ALL)
+                    marks = (f'{self.Fore.YELLOW}{self.Style.BRIGHT}',
+                             self.Style.RESET_ALL)
+                    found = DB.search_saved(self.session.user_id, query, 20, marks)
+                    if len(found) > 0:
+                        nums = {x: i for i, x in enumerate(ids)}
+                        self.pager('MATCHES', found,
+                                   lambda i, x: f"[{str(nums[x[0]] + 1)}] {x[1].title}\n    {x[2]}")
+                    else:
+                        self.error('No matches.')
                 elif action == 2:
-                    article_id = 0
                     article = self.yellow_input('Enter the article #')
                     print(self.Style.RESET_ALL)
                     try:
                         num = int(article)
-                        article_id = ids[num - 1]
-                        article = articles[num - 1]
-                    except:
+                        if num < 1 or num > len(ids):
+                            raise IndexError(num)
+                        article_id, article = next(itertools.islice(
+                            DB.iter_articles(self.session.user_id), num - 1, None))
+                    except (ValueError, IndexError, StopIteration):
                         self.error(self.INVALID)
                         continue
                     self.show_details(article)
@@ -162,6 +282,7 @@ class Main(Menu):
                         action = self.create_menu('ARTICLE', options)
                         if action == 1:
                             DB.delete_article(article_id)
+                            ids = None
                             self.success('Article removed!')
                             break
                         elif action == 0:
@@ -177,10 +298,109 @@ class Main(Menu):
                 self.error('None saved.')
                 break
 
+    def watch_menu(self):
+        '''Display the watchlist menu.'''
+        found = DB.watch_articles(self.session.user_id)
+        print(f'{str(len(found))} new in your watchlist!')
+        action = None
+        while action != 0:
+            options = '[1] View watches\n'\
+                      '[2] View new articles\n'\
+                      '[3] Choose article\n'\
+                      '[4] Watch a search\n'\
+                      '[5] Stop watching\n'\
+                      '[6] Check now\n'\
+                      '[0] Go back\n'
+            action = self.create_menu('WATCHLIST', options)
+            watches = DB.get_watches(self.session.user_id)
+            if action == 1:
+                if len(watches) > 0:
+                    self.pager('WATCHES', watches,
+                               lambda i, watch: f"[{str(i + 1)}] {watch[1]} in {watch[2] or 'All'}"
+                               f' every {watch[3] / 60:g} min, {str(watch[4])} new')
+                else:
+                    self.error('Nothing watched.')
+            elif action == 2:
+                self.pager('NEW', found,
+                           lambda i, x: f'[{str(i + 1)}] ({x[1]}) {x[2].title}')
+                if len(found) == 0:
+                    self.error('Nothing new.')
+                DB.mark_seen(self.session.user_id, [x[0] for x in found])
+            elif action == 3:
+                article = self.yellow_input('Enter the article #')
+                print(self.Style.RESET_ALL)
+                try:
+                    article = int(article)
+                    if article < 1:
+                        raise IndexError(article)
+                    article = found[article - 1][2]
+                except:
+                    self.error(self.INVALID)
+                    continue
+                self.show_details(article)
+                while action != 0:
+                    options = '[1] Save article\n'\
+                              '[0] Go back\n'
+                    action = self.create_menu('ARTICLE', options)
+                    if action == 1:
+                        if DB.add_article(self.session.user_id, article):
+                            self.success('Article saved!')
+                        else:
+                            self.error('Already saved.')
+                        break
+                    elif action == 0:
+                        action = None
+                        break
+                    else:
+                        self.error(self.INVALID)
+            elif action == 4:
+                if len(self.session.source_ids) > News.max_sources:
+                    self.error(
+                        f'Choose at most {str(News.max_sources)} sources to watch.')
+                    continue
+                term = ''
+                while term.strip() == '':
+                    term = self.yellow_input('Enter a term')
+                    print(self.Style.RESET_ALL)
+                minutes = self.yellow_input(
+                    f'Minutes between checks (default {Watch.interval // 60})')
+                print(self.Style.RESET_ALL)
+                try:
+                    interval = float(minutes) * 60 if minutes.strip() else Watch.interval
+                except ValueError:
+                    self.error(self.INVALID)
+                    continue
+                res = DB.add_watch(self.session.user_id, term.strip(), self.session.source_ids,
+                                   max(interval, Watch.min_interval))
+                if res != -1:
+                    self.success('Watching! Articles published from now on will show up here.')
+                else:
+                    self.error('Search already watched.')
+            elif action == 5:
+                watch = self.yellow_input('Enter the watch #')
+                print(self.Style.RESET_ALL)
+                try:
+                    watch = int(watch)
+                    if watch < 1:
+                        raise IndexError(watch)
+                    DB.delete_watch(watches[watch - 1][0], self.session.user_id)
+                except:
+                    self.error(self.INVALID)
+                    continue
+                self.success('Stopped watching!')
+            elif action == 6:
+                print(f'{str(len(Watch.poll(self.session.user_id, True)))} new articles found!')
+                found = DB.watch_articles(self.session.user_id)
+            elif action == 0:
+                break
+            else:
+                self.error(self.INVALID)
+
     def auth_menu(self):
         '''Display the user authentication menu.'''
-        if self.user_id != -1:
-            self.user_id = -1
+        import getpass
+        if self.session.user_id != -1:
+            self.session.user_id = -1
             self.success('You have logged out!')
         else:
             action = None
@@ -193,8 +413,8 @@ class Main(Menu):
                     username = self.yellow_input('Enter username')
                     password = getpass.getpass('Enter password:')
                     print(self.Style.RESET_ALL)
-                    self.user_id = DB.auth_user(username, password)
-                    if self.user_id != -1:
+                    self.session.user_id = DB.auth_user(username, password)
+                    if self.session.user_id != -1:
                         self.success('Welcome back!')
                         break
                     else:
@@ -204,8 +424,8 @@ class Main(Menu):
                     password = getpass.getpass('Enter password:')
                     print(self.Style.RESET_ALL)
                     res = DB.add_user(username, password)
-                    if res != False:
-                        self.user_id = DB.auth_user(username, password)
+                    if res != -1:
+                        self.session.user_id = res
                         self.success('Account created!')
                         break
                     else:
@@ -218,6 +438,10 @@ class Main(Menu):
     def run(self):
         '''Entry point for the application.'''
         self.greeting()
+        if self.archive:
+            DB.prune_archive()
+        if self.offline:
+            print('Offline mode. Searching the local archive.')
 
         action = None
         while action != 0:
@@ -229,13 +453,17 @@ class Main(Menu):
             elif action == 2:
                 self.articles_menu()
             elif action == 3:
-                if self.user_id != -1:
+                if self.session.user_id != -1:
                     self.saved_menu()
                 else:
                     action = 4
                     continue
             elif action == 4:
                 self.auth_menu()
+            elif action == 5 and self.session.user_id != -1:
+                self.watch_menu()
+            elif action == 6:
+                self.trending_menu()
             elif action == 0:
                 self.success('Goodbye!')
                 break
@@ -245,4 +473,31 @@ class Main(Menu):
 
 
 if __name__ == '__main__':
-    Main().run()
+    from cli import CLI
+    args = CLI.parser().parse_args(sys.argv[1:])
+    if args.db is not None:
+        DB.dsn = args.db
+    if args.hash_target is not None:
+        DB.hash_target = args.hash_target
+    if args.record or args.replay:
+        from cassette import Cassette
+        Transport.cassette = Cassette(args.record or args.replay,
+                                      'record' if args.record else 'replay', args.replay_latency)
+
+    def session():
+        if args.command is not None:
+            CLI.run(args)
+        else:
+            main = Main()
+            main.archive = args.archive
+            main.offline = args.offline
+            main.run()
+
+    try:
+        if args.profile is None:
+            session()
+        else:
+            Metrics.profile(session, args.profile or None)
+    finally:
+        if Transport.cassette is not None:
+            Transport.cassette.close()
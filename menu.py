@@ -1,4 +1,4 @@
-from colorama import init, Fore, Back, Style
+from metrics import Metrics
 
 
 class Menu:
@@ -7,13 +7,37 @@ class Menu:
     '''
 
     INVALID = '\nInvalid input.'
+    colorama = None
+    page_size = 10
+    max_field = 600
 
-    def __init__(self):
-        '''Constructor - Assigns class properties.'''
-        init()
-        self.Fore = Fore
-        self.Back = Back
-        self.Style = Style
+    @classmethod
+    def colors(cls):
+        '''Load colorama and wrap the terminal streams the first time a color is needed.
+
+        Returns:
+            module: The return value. The colorama module.
+        '''
+        if cls.colorama is None:
+            import colorama
+            colorama.init()
+            cls.colorama = colorama
+        return cls.colorama
+
+    @property
+    def Fore(self):
+        '''Foreground colors from colorama.'''
+        return self.colors().Fore
+
+    @property
+    def Back(self):
+        '''Background colors from colorama.'''
+        return self.colors().Back
+
+    @property
+    def Style(self):
+        '''Text styles from colorama.'''
+        return self.colors().Style
 
     class Decor:
         '''Class object to hold underline and reverse ASCII values.'''
@@ -29,23 +53,100 @@ class Menu:
         print(self.Style.RESET_ALL)
 
     def show_details(self, article):
-        '''Display the formatted details of a given article.
+        '''Display the formatted details of a given article in a single write. Long fields are truncated.
+
+        Args:
+            article: Target article.
+        '''
+        import sys
+        fields = (('SOURCE', article.source), ('TITLE', article.title),
+                  ('DESCRIPTION', article.description), ('URL', article.url),
+                  ('DATE', article.published_at), ('CONTENT', article.content))
+        reset = self.Style.RESET_ALL
+        sys.stdout.write(''.join(f'{self.Decor.UNDERLINE}{name}{reset}: {self.truncate(value, self.max_field)}\n'
+                                 for name, value in fields))
+        sys.stdout.flush()
+
+    def truncate(self, text, width):
+        '''Collapse the whitespace of the given text and cut it to the given width.
+
+        Args:
+            text: Text to shorten. None for an empty string.
+            width: Maximum number of characters.
+
+        Returns:
+            string: The return value. Text ending in an ellipsis if it was cut.
+        '''
+        text = '' if text is None else ' '.join(str(text).split())
+        return text if len(text) <= width else text[:max(width - 3, 0)] + '...'
+
+    def pager(self, title, items, render):
+        '''Display items a window of page_size at a time, with next, previous and jump to page.
+        Items are pulled from the given iterable only as far as the shown windows need, and each window is written at once with lines cut to the terminal width.
 
         Args:
-            article: Article JSON object.
+            title: Title shown above each window.
+            items: Iterable of items, such as a list or a lazy result iterator.
+            render: Function of the item index and item returning its text. Newlines start extra lines.
         '''
-        print(
-            f"{self.Decor.UNDERLINE}SOURCE{self.Style.RESET_ALL}: {article['source']['name']}")
-        print(
-            f"{self.Decor.UNDERLINE}TITLE{self.Style.RESET_ALL}: {article['title']}")
-        print(
-            f"{self.Decor.UNDERLINE}DESCRIPTION{self.Style.RESET_ALL}: {article['description']}")
-        print(
-            f"{self.Decor.UNDERLINE}URL{self.Style.RESET_ALL}: {article['url']}")
-        print(
-            f"{self.Decor.UNDERLINE}DATE{self.Style.RESET_ALL}: {article['publishedAt']}")
-        print(
-            f"{self.Decor.UNDERLINE}CONTENT{self.Style.RESET_ALL}: {article['content']}")
+        import itertools
+        import shutil
+        import sys
+        size = len(items) if hasattr(items, '__len__') else None
+        source = iter(items)
+        loaded = []
+        done = False
+        start = 0
+        width = max(shutil.get_terminal_size().columns - 1, 20)
+        while True:
+            if not done and len(loaded) <= start + self.page_size:
+                wanted = start + self.page_size + 1 - len(loaded)
+                loaded.extend(itertools.islice(source, wanted))
+                done = len(loaded) <= start + self.page_size
+            window = loaded[start:start + self.page_size]
+            page = start // self.page_size + 1
+            pages = -(-(len(loaded) if size is None else size) // self.page_size)
+            last = done and page >= pages
+            lines = []
+            if page > 1 or not last:
+                lines.append(f"{self.Fore.YELLOW}{self.Style.BRIGHT}{title}: page {page} of {pages}{'' if done or size is not None else '+'}"
+                             f'{self.Style.RESET_ALL}')
+            for i, item in enumerate(window, start):
+                lines.extend(self.truncate(x, width)
+                             for x in render(i, item).split('\n'))
+            if page == 1 and last:
+                sys.stdout.write('\n'.join(lines) + '\n')
+                sys.stdout.flush()
+                return
+            lines.append(f'{self.Decor.REVERSE}[n] Next  [p] Previous  [#] Go to page  [0] Done{self.Style.RESET_ALL}')
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
+            choice = self.yellow_input('Choose option').strip().lower()
+            print(self.Style.RESET_ALL)
+            if choice in ('', 'n'):
+                if last:
+                    self.error('Last page.')
+                else:
+                    start += self.page_size
+            elif choice == 'p':
+                if page == 1:
+                    self.error('First page.')
+                else:
+                    start -= self.page_size
+            elif choice == '0':
+                return
+            elif choice.isdigit() and int(choice) >= 1:
+                target = (int(choice) - 1) * self.page_size
+                if not done and len(loaded) <= target:
+                    loaded.extend(itertools.islice(
+                        source, target + 1 - len(loaded)))
+                    done = len(loaded) <= target
+                if target < len(loaded):
+                    start = target
+                else:
+                    self.error(f'Only {str(-(-len(loaded) // self.page_size))} pages.')
+            else:
+                self.error(self.INVALID)
 
     def create_menu(self, title, menu):
         '''Display formatted output of a given menu.
@@ -55,20 +156,23 @@ class Menu:
             menu: Contents of the menu.
 
         Returns:
-            int: The return value. Number of the chosen action if success. Recurse the method if error.
+            int: The return value. Number of the chosen action. Ask again until the input is a number.
         '''
-        print()
-        print(f'{self.Fore.YELLOW}{self.Back.CYAN}{self.Style.BRIGHT}' +
-              ':---------- ' + title + ' ----------:')
-        print(Style.RESET_ALL)
-        print(f'{self.Decor.REVERSE}{menu}{Style.RESET_ALL}')
-        action = self.yellow_input('Choose option')
-        print(Style.RESET_ALL)
-        try:
-            return int(action)
-        except:
-            self.error(self.INVALID)
-            return self.create_menu(title, menu)
+        while True:
+            print()
+            print(f'{self.Fore.YELLOW}{self.Back.CYAN}{self.Style.BRIGHT}' +
+                  ':---------- ' + title + ' ----------:')
+            print(self.Style.RESET_ALL)
+            print(f'{self.Decor.REVERSE}{menu}{self.Style.RESET_ALL}')
+            action = self.yellow_input('Choose option')
+            print(self.Style.RESET_ALL)
+            try:
+                action = int(action)
+            except ValueError:
+                self.error(self.INVALID)
+                continue
+            Metrics.count('menu_actions_total', menu=title)
+            return action
 
     def success(self, msg):
         '''Display a given message with success formatting.
@@ -77,8 +181,8 @@ class Menu:
             msg: Message to format.
         '''
         print()
-        print(f'{Fore.WHITE}{Back.GREEN}{Style.BRIGHT}{msg}')
-        print(Style.RESET_ALL)
+        print(f'{self.Fore.WHITE}{self.Back.GREEN}{self.Style.BRIGHT}{msg}')
+        print(self.Style.RESET_ALL)
 
     def error(self, msg):
         '''Display a given message with error formatting.
@@ -87,8 +191,8 @@ class Menu:
             msg: Message to format.
         '''
         print()
-        print(f'{Fore.WHITE}{Back.RED}{Style.BRIGHT}{msg}')
-        print(Style.RESET_ALL)
+        print(f'{self.Fore.WHITE}{self.Back.RED}{self.Style.BRIGHT}{msg}')
+        print(self.Style.RESET_ALL)
 
     def yellow_input(self, msg):
         '''Add yellow formatting to the given input.
@@ -99,5 +203,5 @@ class Menu:
         Returns:
             string: The return value. Input with yellow formatting.
         '''
-        print(f'{Fore.YELLOW}{Style.BRIGHT}')
+        print(f'{self.Fore.YELLOW}{self.Style.BRIGHT}')
         return input(f'{msg}: ')
@@ -0,0 +1,266 @@
+import contextlib
+import threading
+import time
+
+
+class Metrics:
+    '''Metrics class
+    Provides process wide counters and timers, a profiler for whole sessions and exporters in Prometheus text and JSON.
+    '''
+
+    enabled = True
+    lock = threading.Lock()
+    counters = {}
+    timers = {}
+    statements = {}
+    max_statements = 512
+    prefix = 'tns_'
+
+    @classmethod
+    def labels(cls, labels):
+        '''Turn keyword labels into a hashable, ordered key.
+
+        Args:
+            labels: Dictionary of label names and values.
+
+        Returns:
+            tuple: The return value. Sorted pairs of label names and string values.
+        '''
+        return tuple(sorted((x, str(y)) for x, y in labels.items()))
+
+    @classmethod
+    def count(cls, name, value=1, **labels):
+        '''Add to a counter.
+
+        Args:
+            name: Name of the counter.
+            value: Amount to add.
+            labels: Label names and values of the series.
+        '''
+        if not cls.enabled:
+            return
+        key = (name, cls.labels(labels))
+        with cls.lock:
+            cls.counters[key] = cls.counters.get(key, 0) + value
+
+    @classmethod
+    def observe(cls, name, seconds, **labels):
+        '''Record one duration of a timer.
+
+        Args:
+            name: Name of the timer.
+            seconds: Measured duration.
+            labels: Label names and values of the series.
+        '''
+        if not cls.enabled:
+            return
+        key = (name, cls.labels(labels))
+        with cls.lock:
+            timer = cls.timers.get(key)
+            if timer is None:
+                cls.timers[key] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    @classmethod
+    @contextlib.contextmanager
+    def timer(cls, name, **labels):
+        '''Time the enclosed block, whether or not it raises.
+
+        Args:
+            name: Name of the timer.
+            labels: Label names and values of the series.
+        '''
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe(name, time.perf_counter() - began, **labels)
+
+    @classmethod
+    def statement(cls, sql):
+        '''Normalize an SQL statement into a label, so statements differing only in literals or placeholder counts share a series.
+
+        Args:
+            sql: SQL statement.
+
+        Returns:
+            string: The return value. Normalized statement.
+        '''
+        normal = cls.statements.get(sql)
+        if normal is None:
+            import re
+            normal = ' '.join(sql.split())
+            normal = re.sub(r"'(?:[^']|'')*'", '?', normal)
+            normal = re.sub(r'\b\d+(\.\d+)?\b', '?', normal)
+            normal = re.sub(r'\?(\s*,\s*\?)+', '?, ...', normal)
+            if len(cls.statements) >= cls.max_statements:
+                cls.statements.clear()
+            cls.statements[sql] = normal
+        return normal
+
+    @classmethod
+    def snapshot(cls):
+        '''Copy every series.
+
+        Returns:
+            dictionary: The return value. Counters and timers, each a list of series with name, labels and values.
+        '''
+        with cls.lock:
+            counters = [{'name': x[0], 'labels': dict(x[1]), 'value': y}
+                        for x, y in sorted(cls.counters.items())]
+            timers = [{'name': x[0], 'labels': dict(x[1]), 'count': y[0],
+                       'sum': round(y[1], 6), 'max': round(y[2], 6)}
+                      for x, y in sorted(cls.timers.items())]
+        return {'counters': counters, 'timers': timers}
+
+    @classmethod
+    def json(cls):
+        '''Export every series as JSON.
+
+        Returns:
+            string: The return value. JSON document of Metrics.snapshot.
+        '''
+        import json
+        return json.dumps(cls.snapshot())
+
+    @classmethod
+    def prometheus(cls):
+        '''Export every series in the Prometheus text exposition format. Timers are exported as summaries with a max gauge.
+
+        Returns:
+            string: The return value. Metrics text.
+        '''
+        def series(name, labels, value):
+            labels = ','.join('{}="{}"'.format(x, y.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                              for x, y in labels.items())
+            return f'{cls.prefix}{name}{{{labels}}} {value}' if labels else f'{cls.prefix}{name} {value}'
+
+        snapshot = cls.snapshot()
+        lines = []
+        typed = set()
+        for counter in snapshot['counters']:
+            if counter['name'] not in typed:
+                typed.add(counter['name'])
+                lines.append(f"# TYPE {cls.prefix}{counter['name']} counter")
+            lines.append(series(counter['name'], counter['labels'], counter['value']))
+        for timer in snapshot['timers']:
+            if timer['name'] not in typed:
+                typed.add(timer['name'])
+                lines.append(f"# TYPE {cls.prefix}{timer['name']} summary")
+                lines.append(f"# TYPE {cls.prefix}{timer['name']}_max gauge")
+            lines.append(series(f"{timer['name']}_count", timer['labels'], timer['count']))
+            lines.append(series(f"{timer['name']}_sum", timer['labels'], timer['sum']))
+            lines.append(series(f"{timer['name']}_max", timer['labels'], timer['max']))
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def summary(cls, limit=10):
+        '''Summarize the timers that took the most time in total.
+
+        Args:
+            limit: Maximum number of timers listed.
+
+        Returns:
+            string: The return value. One line per timer with its calls, total, mean and max.
+        '''
+        timers = sorted(cls.snapshot()['timers'], key=lambda x: -x['sum'])[:limit]
+        lines = [f"{'calls':>8} {'total s':>9} {'mean ms':>9} {'max ms':>9}  timer"]
+        for timer in timers:
+            labels = ' '.join(f'{x}={y}' for x, y in timer['labels'].items())
+            lines.append(f"{timer['count']:>8} {timer['sum']:>9.3f} {timer['sum'] / timer['count'] * 1000:>9.2f} "
+                         f"{timer['max'] * 1000:>9.2f}  {timer['name']} {labels}")
+        return '\n'.join(lines)
+
+    @classmethod
+    def reset(cls):
+        '''Forget every series.'''
+        with cls.lock:
+            cls.counters.clear()
+            cls.timers.clear()
+
+    @classmethod
+    def profile(cls, run, path=None, limit=20, file=None):
+        '''Run the given function under cProfile and tracemalloc, then print a summary of where time and memory went.
+
+        Args:
+            run: Function without arguments to profile.
+            path: File to dump the raw cProfile statistics to, for pstats or snakeviz. None to skip.
+            limit: Number of entries in each table of the summary.
+            file: Stream to print the summary to. None for stderr.
+
+        Returns:
+            object: The return value. Result of run.
+        '''
+        import cProfile
+        import io
+        import pstats
+        import sys
+        import tracemalloc
+        file = file or sys.stderr
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        profiler.enable()
+        try:
+            return run()
+        finally:
+            profiler.disable()
+            memory = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if path is not None:
+                profiler.dump_stats(path)
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats(
+                'cumulative').print_stats(limit)
+            print('==== PROFILE: cumulative time ====', file=file)
+            print(out.getvalue().strip(), file=file)
+            print(f'==== PROFILE: memory (current {current / 1024:.1f} KiB, '
+                  f'peak {peak / 1024:.1f} KiB) ====', file=file)
+            for stat in memory.statistics('lineno')[:limit]:
+                print(stat, file=file)
+            print('==== PROFILE: timers ====', file=file)
+            print(cls.summary(limit), file=file)
+
+    @classmethod
+    def serve(cls, port, host='127.0.0.1'):
+        '''Serve the metrics over HTTP on a background thread.
+        /metrics answers in the Prometheus text format and /metrics.json in JSON.
+
+        Args:
+            port: Port to listen on. 0 for any free port.
+            host: Address to listen on.
+
+        Returns:
+            ThreadingHTTPServer: The return value. Running server. Call shutdown() to stop it.
+        '''
+        import http.server
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = cls.prometheus().encode()
+                    kind = 'text/plain; version=0.0.4'
+                elif path == '/metrics.json':
+                    body = cls.json().encode()
+                    kind = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,174 @@
+import argparse
+import gzip
+import http.server
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+
+class MockAPI:
+    '''MockAPI class
+    Provides a local stand-in for News API that replays recorded payloads.
+    '''
+
+    def __init__(self, payloads=None, latency=0, articles=100, sources=50, content=200, port=0):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            payloads: Directory holding recorded sources.json and top-headlines.json responses. None to generate payloads.
+            latency: Seconds to wait before answering each request.
+            articles: Number of generated articles when no recording is given.
+            sources: Number of generated sources when no recording is given.
+            content: Length of the generated article content when no recording is given.
+            port: Port to listen on. 0 for any free port.
+        '''
+        self.latency = latency
+        self.port = port
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = None
+        if payloads is not None:
+            with open(os.path.join(payloads, 'sources.json'), 'rb') as file:
+                self.sources = json.load(file)['sources']
+            with open(os.path.join(payloads, 'top-headlines.json'), 'rb') as file:
+                self.articles = json.load(file)['articles']
+        else:
+            self.sources = [self.make_source(i) for i in range(sources)]
+            self.articles = [self.make_article(i, content)
+                             for i in range(articles)]
+
+    def make_source(self, num):
+        '''Generate a source object shaped like the ones News API returns.
+
+        Args:
+            num: Number of the source.
+
+        Returns:
+            dictionary: The return value. Source JSON object.
+        '''
+        categories = ('business', 'entertainment', 'general',
+                      'health', 'science', 'sports', 'technology')
+        return {'id': f'source-{num}', 'name': f'Source {num}', 'description': f'Mock source {num}.',
+                'url': f'https://source-{num}.example.com', 'category': categories[num % len(categories)],
+                'language': ('en', 'de', 'fr')[num % 3], 'country': ('us', 'gb', 'de', 'fr')[num % 4]}
+
+    def make_article(self, num, content):
+        '''Generate an article object shaped like the ones News API returns.
+
+        Args:
+            num: Number of the article.
+            content: Length of the article content.
+
+        Returns:
+            dictionary: The return value. Article JSON object.
+        '''
+        source = self.sources[num % len(self.sources)] if self.sources else {
+            'id': None, 'name': 'Mock'}
+        return {'source': {'id': source['id'], 'name': source['name']},
+                'author': f'Author {num % 17}',
+                'title': f'Mock headline number {num} about markets and elections',
+                'description': f'Description of mock article {num} covering the latest developments.',
+                'url': f'https://news.example.com/articles/{num}',
+                'urlToImage': f'https://news.example.com/images/{num}.jpg',
+                'publishedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1600000000 + num * 60)),
+                'content': ('Lorem ipsum dolor sit amet. ' * (content // 28 + 1))[:content]}
+
+    def respond(self, path):
+        '''Build the response body for the given request path.
+        The search term is ignored so every search replays the same payload.
+
+        Args:
+            path: Request path with query string.
+
+        Returns:
+            tuple: The return value. Status code and response object.
+        '''
+        parts = urllib.parse.urlsplit(path)
+        params = dict(urllib.parse.parse_qsl(parts.query))
+        endpoint = parts.path.rstrip('/').rsplit('/', 1)[-1]
+        if endpoint == 'sources':
+            return 200, {'status': 'ok', 'sources': self.sources}
+        if endpoint == 'top-headlines':
+            articles = self.articles
+            if 'sources' in params:
+                ids = set(params['sources'].split(','))
+                articles = [x for x in articles if x['source']['id'] in ids]
+            size = int(params.get('pageSize', 20))
+            page = int(params.get('page', 1))
+            start = (page - 1) * size
+            return 200, {'status': 'ok', 'totalResults': len(articles),
+                         'articles': articles[start:start + size]}
+        return 404, {'status': 'error', 'code': 'notFound', 'message': 'Unknown endpoint.'}
+
+    def handler(self):
+        '''Build the request handler class bound to this stand-in.
+
+        Returns:
+            type: The return value. Subclass of BaseHTTPRequestHandler.
+        '''
+        mock = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            wbufsize = 64 * 1024
+
+            def do_GET(self):
+                with mock.lock:
+                    mock.requests += 1
+                if mock.latency:
+                    time.sleep(mock.latency)
+                status, obj = mock.respond(self.path)
+                body = json.dumps(obj).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body, 5)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        '''Start serving on a background thread.
+
+        Returns:
+            string: The return value. Base URL to assign to News.news_url.
+        '''
+        self.server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', self.port), self.handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f'http://127.0.0.1:{self.server.server_port}/v2/'
+
+    def stop(self):
+        '''Stop serving and release the port.'''
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serve a local stand-in for News API.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--payloads', help='directory of recorded responses')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds per response')
+    parser.add_argument('--articles', type=int, default=100)
+    parser.add_argument('--content', type=int, default=200)
+    args = parser.parse_args()
+    mock = MockAPI(args.payloads, args.latency, args.articles,
+                   content=args.content, port=args.port)
+    print(f'Serving {mock.start()}  (set NEWS_URL to use it)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        mock.stop()
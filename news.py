@@ -1,7 +1,329 @@
-import json
+import collections
 import os
-import urllib.parse
-import urllib.request
+import threading
+import time
+
+from article import Article
+from cache import Cache
+from dedup import Dedup
+from metrics import Metrics
+
+
+class Transport:
+    '''Transport class
+    Provides pooled keep-alive HTTP connections for REST calls.
+    '''
+
+    max_per_host = 4
+    connect_timeout = 5
+    read_timeout = 30
+    retries = 3
+    backoff = 0.5
+    max_retry_after = 30
+    retry_statuses = (429, 500, 502, 503, 504)
+    chunk_size = 64 * 1024
+    lock = threading.Lock()
+    idle = {}
+    slots = {}
+    cassette = None
+
+    @classmethod
+    def request(cls, url, headers=None):
+        '''Send a GET request over a pooled connection, retrying with backoff on throttling and server errors.
+        A Retry-After delay asked by the server is honored up to max_retry_after seconds.
+
+        Args:
+            url: Target URL with formatted query string.
+            headers: Extra request headers.
+
+        Returns:
+            tuple: The return value. Status code, response headers and decompressed body.
+        '''
+        import http.client
+        import urllib.parse
+        cassette = cls.cassette
+        if cassette is not None and cassette.replaying:
+            return cassette.replay(url)
+        parts = urllib.parse.urlsplit(url)
+        host = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        headers = dict(headers or {})
+        if cassette is not None:
+            for header in cassette.conditional_headers:
+                headers.pop(header, None)
+        headers.setdefault('Accept-Encoding', 'gzip')
+        headers.setdefault('Connection', 'keep-alive')
+        began = time.perf_counter()
+        for attempt in range(cls.retries + 1):
+            if attempt > 0:
+                Metrics.count('http_retries_total', host=parts.hostname)
+            try:
+                status, res_headers, body = cls.send(host, path, headers)
+            except (OSError, http.client.HTTPException) as err:
+                Metrics.count('http_errors_total', host=parts.hostname,
+                              error=type(err).__name__)
+                if attempt == cls.retries:
+                    raise
+                time.sleep(cls.backoff * 2 ** attempt)
+                continue
+            if status not in cls.retry_statuses or attempt == cls.retries:
+                break
+            delay = res_headers.get('Retry-After', '')
+            time.sleep(min(float(delay), cls.max_retry_after) if delay.isdigit()
+                       else cls.backoff * 2 ** attempt)
+        Metrics.observe('http_request_seconds', time.perf_counter() - began,
+                        host=parts.hostname)
+        Metrics.count('http_requests_total', host=parts.hostname, status=status)
+        Metrics.count('http_response_bytes_total', len(body), host=parts.hostname)
+        if cassette is not None:
+            cassette.record_response(url, status, res_headers, body, time.perf_counter() - began)
+        return status, res_headers, body
+
+    @classmethod
+    def send(cls, host, path, headers):
+        '''Send a single request to the given host, replacing a reused connection once if the server dropped it.
+
+        Args:
+            host: Tuple of scheme, host name and port.
+            path: Request path with query string.
+            headers: Request headers.
+
+        Returns:
+            tuple: The return value. Status code, response headers and decompressed body.
+        '''
+        import http.client
+        slot = cls.slot(host)
+        slot.acquire()
+        try:
+            conn, reused = cls.checkout(host)
+            try:
+                try:
+                    res = cls.exchange(conn, path, headers)
+                except (http.client.RemoteDisconnected, ConnectionError):
+                    if not reused:
+                        raise
+                    conn.close()
+                    conn = cls.connect(host)
+                    res = cls.exchange(conn, path, headers)
+            except BaseException:
+                conn.close()
+                raise
+            status, res_headers, body, keep = res
+            if keep:
+                with cls.lock:
+                    cls.idle.setdefault(host, []).append(conn)
+            else:
+                conn.close()
+            return status, res_headers, body
+        finally:
+            slot.release()
+
+    @classmethod
+    def exchange(cls, conn, path, headers):
+        '''Write the request to the given connection and read the full response.
+
+        Args:
+            conn: Open HTTP connection.
+            path: Request path with query string.
+            headers: Request headers.
+
+        Returns:
+            tuple: The return value. Status code, response headers, decompressed body and whether the connection can be reused.
+        '''
+        import zlib
+        conn.request('GET', path, headers=headers)
+        res = conn.getresponse()
+        if res.getheader('Content-Encoding', '').lower() == 'gzip':
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            chunks = []
+            chunk = res.read(cls.chunk_size)
+            while chunk:
+                chunks.append(decoder.decompress(chunk))
+                chunk = res.read(cls.chunk_size)
+            chunks.append(decoder.flush())
+            body = b''.join(chunks)
+        else:
+            body = res.read()
+        return res.status, res.headers, body, not res.will_close
+
+    @classmethod
+    def slot(cls, host):
+        '''Retrieve the semaphore limiting concurrent connections to the given host.
+
+        Args:
+            host: Tuple of scheme, host name and port.
+
+        Returns:
+            BoundedSemaphore: The return value. Per host connection limit.
+        '''
+        with cls.lock:
+            if host not in cls.slots:
+                cls.slots[host] = threading.BoundedSemaphore(cls.max_per_host)
+            return cls.slots[host]
+
+    @classmethod
+    def checkout(cls, host):
+        '''Take an idle connection to the given host from the pool or open a new one.
+
+        Args:
+            host: Tuple of scheme, host name and port.
+
+        Returns:
+            tuple: The return value. Connection and whether it was reused from the pool.
+        '''
+        with cls.lock:
+            pool = cls.idle.get(host)
+            if pool:
+                return pool.pop(), True
+        return cls.connect(host), False
+
+    @classmethod
+    def connect(cls, host):
+        '''Open a new connection to the given host using the connect and read timeouts.
+
+        Args:
+            host: Tuple of scheme, host name and port.
+
+        Returns:
+            HTTPConnection: The return value. Connected HTTP or HTTPS connection.
+        '''
+        import http.client
+        scheme, hostname, port = host
+        conn_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        conn = conn_class(hostname, port, timeout=cls.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(cls.read_timeout)
+        return conn
+
+    @classmethod
+    def close(cls):
+        '''Close every idle pooled connection.'''
+        with cls.lock:
+            pools = list(cls.idle.values())
+            cls.idle = {}
+        for pool in pools:
+            for conn in pool:
+                conn.close()
+
+
+class RateLimiter:
+    '''RateLimiter class
+    Provides a token bucket that spaces out requests to stay within the API quota.
+    '''
+
+    def __init__(self, rate, burst):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            rate: Tokens added to the bucket per second.
+            burst: Maximum number of tokens the bucket holds.
+        '''
+        import asyncio
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        '''Wait until a token is available and take it.'''
+        import asyncio
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Memo:
+    '''Memo class
+    Provides a bounded LRU of recent results that collapses concurrent calls for the same key into one call.
+    '''
+
+    def __init__(self, max_entries, ttl):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            max_entries: Maximum number of results kept.
+            ttl: Seconds a result is kept. 0 to only collapse concurrent calls.
+        '''
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key, load, max_age=None):
+        '''Return the result for the given key, calling load only if no fresh result is kept and no call for the key is in flight.
+        Callers arriving while a call is in flight wait for it and share its result or exception.
+
+        Args:
+            key: Hashable key of the call.
+            load: Function without arguments producing the result.
+            max_age: Oldest kept result in seconds the caller accepts. None for ttl.
+
+        Returns:
+            object: The return value. Result of load.
+        '''
+        import concurrent.futures
+        leader = False
+        with self.lock:
+            entry = self.entries.get(key)
+            max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+            if entry is not None and time.monotonic() - entry[0] < max_age:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = concurrent.futures.Future()
+                leader = True
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.result()
+        try:
+            value = load()
+        except BaseException as err:
+            with self.lock:
+                del self.flights[key]
+            flight.set_exception(err)
+            raise
+        with self.lock:
+            del self.flights[key]
+            if self.ttl > 0:
+                self.entries[key] = (time.monotonic(), value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        flight.set_result(value)
+        return value
+
+    def stats(self):
+        '''Report the counters of the memo.
+
+        Returns:
+            dictionary: The return value. Hits, misses, calls collapsed into one in flight, evictions and kept entries.
+        '''
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                    'evictions': self.evictions, 'entries': len(self.entries)}
+
+    def clear(self):
+        '''Forget every kept result.'''
+        with self.lock:
+            self.entries.clear()
 
 
 class News:
@@ -9,41 +331,110 @@ class News:
     Provides access to News API via REST calls.
     '''
 
-    news_url = 'http://newsapi.org/v2/'
-    api_key = os.environ['API_KEY']
+    news_url = os.environ.get('NEWS_URL', 'http://newsapi.org/v2/')
+    api_key = None
     sources_ep = 'sources'
     headlines_ep = 'top-headlines'
     api_param = 'apiKey'
     sources_param = 'sources'
     term_param = 'q'
     page_param = 'pageSize'
+    page_number_param = 'page'
+    page_size = 100
+    cache_ttls = {sources_ep: 86400, headlines_ep: 300}
+    max_sources = 20
+    max_concurrency = 4
+    rate_limit = 5
+    rate_burst = 5
+    memo = Memo(256, 60)
+
+    @classmethod
+    def get_api_key(cls):
+        '''Resolve the News API key from the API_KEY environment variable the first time it is needed.
+
+        Returns:
+            string: The return value. News API key. A placeholder when replaying a cassette without a key.
+        '''
+        if cls.api_key is None:
+            if 'API_KEY' not in os.environ and Transport.cassette is not None and Transport.cassette.replaying:
+                return 'replay'
+            if 'API_KEY' not in os.environ:
+                raise RuntimeError(
+                    'Set the API_KEY environment variable to your News API key.')
+            cls.api_key = os.environ['API_KEY']
+        return cls.api_key
 
     @classmethod
-    def request_json(cls, url, key):
+    def request_json(cls, url, key, max_age=None):
         '''Request JSON from the given URL with a formatted query string.
+        The response cache is bypassed while a cassette records or replays, so recordings hold every response and replays serve only recorded ones.
+        Cached responses older than max_age are revalidated with the API before they are served.
 
         Args:
             url: Target URL with formatted query string.
-            key: Key for the target value within the returned JSON object.
+            key: Key for the target value within the returned JSON object. None for the whole object.
+            max_age: Oldest cached response in seconds the caller accepts. None for the endpoint's cache ttl.
 
         Returns:
             string: The return value. Value from the returned JSON object based on the given key.
         '''
-        req = urllib.request.urlopen(url)
-        data = req.read()
-        obj = json.loads(data.decode('utf-8'))
-        return obj[key]
+        import http.client
+        import json
+        import urllib.error
+        cache_key = Cache.normalize(url)
+        caching = Transport.cassette is None
+        cached = Cache.get(cache_key) if caching else None
+        ttl = cls.cache_ttl(url) if max_age is None else min(max_age, cls.cache_ttl(url))
+        if cached is not None and time.time() - cached['stored_at'] < ttl:
+            data = cached['body']
+            Metrics.count('response_cache_total', result='hit')
+        else:
+            headers = {}
+            if cached is not None:
+                if cached['etag']:
+                    headers['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    headers['If-Modified-Since'] = cached['last_modified']
+            status, res_headers, data = Transport.request(url, headers)
+            if status == 304 and cached is not None:
+                data = cached['body']
+                Cache.refresh(cache_key)
+                Metrics.count('response_cache_total', result='revalidated')
+            elif status != 200:
+                raise urllib.error.HTTPError(
+                    url, status, http.client.responses.get(status, ''), res_headers, None)
+            elif caching:
+                Cache.put(cache_key, data, res_headers.get('ETag'),
+                          res_headers.get('Last-Modified'))
+                Metrics.count('response_cache_total', result='miss')
+        with Metrics.timer('decode_seconds', format='json'):
+            obj = json.loads(data.decode('utf-8'))
+        return obj if key is None else obj[key]
+
+    @classmethod
+    def cache_ttl(cls, url):
+        '''Look up how long a cached response for the given URL stays fresh.
+
+        Args:
+            url: Target URL with formatted query string.
+
+        Returns:
+            int: The return value. Time to live in seconds. 0 if the endpoint is not cached.
+        '''
+        import urllib.parse
+        path = urllib.parse.urlsplit(url).path
+        endpoint = path.rstrip('/').rsplit('/', 1)[-1]
+        return cls.cache_ttls.get(endpoint, 0)
 
     @classmethod
     def get_sources(cls):
         '''Request all available sources from News API.
 
         Returns:
-            dictionary: The return value. Keys are names of sources. Values are IDs of sources.
+            list: The return value. Source JSON objects.
         '''
-        url = f'{cls.news_url}{cls.sources_ep}?{cls.api_param}={cls.api_key}'
-        sources = cls.request_json(url, 'sources')
-        return dict(enumerate(sources))
+        url = f'{cls.news_url}{cls.sources_ep}?{cls.api_param}={cls.get_api_key()}'
+        return cls.request_json(url, 'sources')
 
     @classmethod
     def search_term(cls, term, sources):
@@ -54,12 +445,349 @@ class News:
             sources: Comma separated list of news source IDs.
 
         Returns:
-            dictionary: The return value. Keys are titles of articles. Values are objects containing contents of articles.
+            list: The return value. Matching articles.
+        '''
+        def load():
+            url = cls.headlines_url(term, sources, 1)
+            return [Article.from_json(x) for x in cls.request_json(url, 'articles')]
+
+        return list(cls.memo.get(('search', *cls.memo_key(term, sources)), load))
+
+    @classmethod
+    def memo_key(cls, term, sources):
+        '''Normalize a search so equivalent calls share a memo entry.
+
+        Args:
+            term: Target term to search for within articles.
+            sources: Collection or comma separated string of news source IDs.
+
+        Returns:
+            tuple: The return value. Lower case term with collapsed whitespace and sorted source IDs.
+        '''
+        if isinstance(sources, str):
+            sources = [x.strip() for x in sources.split(',')]
+        return ' '.join(term.lower().split()), tuple(sorted(x for x in sources if x))
+
+    @classmethod
+    def headlines_url(cls, term, sources, page, page_size=None):
+        '''Build the top headlines URL for the given term, sources and page.
+
+        Args:
+            term: Target term to search for within articles. Empty for every article of the sources.
+            sources: Collection or comma separated string of news source IDs. Empty for all sources.
+            page: Page number, starting at 1.
+            page_size: Articles per page. None for page_size.
+
+        Returns:
+            string: The return value. Target URL with formatted query string.
         '''
-        if sources != '':
-            sources = ','.join([x for x in sources])
+        import urllib.parse
+        if len(sources) > 0:
+            if not isinstance(sources, str):
+                sources = ','.join(sorted(sources))
             sources = f'{cls.sources_param}={sources}&'
-        term = urllib.parse.quote(term)
-        url = f'{cls.news_url}{cls.headlines_ep}?{sources}{cls.term_param}={term}&{cls.page_param}=100&{cls.api_param}={cls.api_key}'
-        articles = cls.request_json(url, 'articles')
-        return dict(enumerate(articles))
+        else:
+            sources = ''
+        term = f'{cls.term_param}={urllib.parse.quote(term)}&' if term else ''
+        page_size = page_size or cls.page_size
+        return f'{cls.news_url}{cls.headlines_ep}?{sources}{term}{cls.page_param}={page_size}&{cls.page_number_param}={page}&{cls.api_param}={cls.get_api_key()}'
+
+    @classmethod
+    def iter_articles(cls, term, sources):
+        '''Lazily yield every article matching the given term, page by page.
+        The next page is requested in the background while the current one is consumed.
+
+        Args:
+            term: Target term to search for within articles.
+            sources: Comma separated list of news source IDs.
+
+        Yields:
+            Article: Matching article.
+        '''
+        import concurrent.futures
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        page = 1
+        fetched = 0
+        future = pool.submit(cls.request_page, term, sources, page)
+        try:
+            while future is not None:
+                res = future.result()
+                articles = res.get('articles', [])
+                fetched += len(articles)
+                page += 1
+                future = None
+                if len(articles) > 0 and fetched < res.get('totalResults', 0):
+                    future = pool.submit(cls.request_page, term, sources, page)
+                for article in articles:
+                    yield Article.from_json(article)
+        finally:
+            if future is not None:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    @classmethod
+    def request_page(cls, term, sources, page, page_size=None, max_age=None):
+        '''Request a single page of top headlines.
+
+        Args:
+            term: Target term to search for within articles.
+            sources: Comma separated list of news source IDs.
+            page: Page number, starting at 1.
+            page_size: Articles per page. None for page_size.
+            max_age: Oldest remembered or cached page in seconds the caller accepts. None for the memo and cache ttls.
+
+        Returns:
+            dictionary: The return value. Response object. Empty if the API refuses to page any further.
+        '''
+        import urllib.error
+
+        def load():
+            try:
+                return cls.request_json(cls.headlines_url(term, sources, page, page_size), None, max_age)
+            except urllib.error.HTTPError as err:
+                if page > 1 and err.code in (400, 426):
+                    return {}
+                raise
+
+        key = ('page', *cls.memo_key(term, sources), page, page_size or cls.page_size)
+        return cls.memo.get(key, load, max_age)
+
+    @classmethod
+    def chunk_sources(cls, sources):
+        '''Split a list of source IDs into groups small enough for a single request.
+
+        Args:
+            sources: List or comma separated string of news source IDs. Empty for all sources.
+
+        Returns:
+            list: The return value. Lists of at most max_sources IDs. A single empty string for all sources.
+        '''
+        if isinstance(sources, str):
+            sources = [x.strip() for x in sources.split(',') if x.strip()]
+        if len(sources) == 0:
+            return ['']
+        sources = sorted(sources)
+        return [sources[i:i + cls.max_sources] for i in range(0, len(sources), cls.max_sources)]
+
+    @classmethod
+    async def search_many(cls, terms, source_groups=None):
+        '''Search every combination of the given terms and source groups concurrently.
+        Requests are bounded by max_concurrency and paced by a rate_limit token bucket.
+
+        Args:
+            terms: Target terms to search for within articles.
+            source_groups: Lists or comma separated strings of news source IDs. None for all sources.
+
+        Returns:
+            list: The return value. Articles from every search, deduplicated by canonical URL in order of first appearance.
+        '''
+        import asyncio
+        results = await asyncio.gather(*cls.searches(terms, source_groups))
+        return cls.merge(results)
+
+    @classmethod
+    async def stream_many(cls, terms, source_groups=None):
+        '''Search every combination of the given terms and source groups concurrently, yielding results as each request completes.
+
+        Args:
+            terms: Target terms to search for within articles.
+            source_groups: Lists or comma separated strings of news source IDs. None for all sources.
+
+        Yields:
+            Article: Matching article. Articles linking to a page already yielded are skipped.
+        '''
+        import asyncio
+        seen = set()
+        for search in asyncio.as_completed(cls.searches(terms, source_groups)):
+            for article in await search:
+                url = Dedup.canonical_url(article.url)
+                if url not in seen:
+                    seen.add(url)
+                    yield article
+
+    @classmethod
+    def searches(cls, terms, source_groups):
+        '''Build one search per combination of term and source chunk, sharing a concurrency limit and rate limiter.
+
+        Args:
+            terms: Target terms to search for within articles.
+            source_groups: Lists or comma separated strings of news source IDs. None for all sources.
+
+        Returns:
+            list: The return value. Coroutines resolving to the results of News.search_term.
+        '''
+        import asyncio
+        jobs = [(term, chunk) for term in terms
+                for group in (source_groups or [''])
+                for chunk in cls.chunk_sources(group)]
+        semaphore = asyncio.Semaphore(cls.max_concurrency)
+        limiter = RateLimiter(cls.rate_limit, cls.rate_burst)
+        loop = asyncio.get_running_loop()
+
+        async def run(term, sources):
+            async with semaphore:
+                await limiter.acquire()
+                return await loop.run_in_executor(None, cls.search_term, term, sources)
+
+        return [run(*job) for job in jobs]
+
+    @classmethod
+    def merge(cls, results):
+        '''Merge several result sets, keeping the first article seen for each canonical URL.
+
+        Args:
+            results: Iterables of articles.
+
+        Returns:
+            list: The return value. Unique articles in order of first appearance.
+        '''
+        seen = set()
+        merged = []
+        for articles in results:
+            for article in articles:
+                url = Dedup.canonical_url(article.url)
+                if url not in seen:
+                    seen.add(url)
+                    merged.append(article)
+        return merged
+
+
+class Catalog:
+    '''Catalog class
+    Provides an indexed copy of the News API sources list, persisted locally and refreshed daily.
+    '''
+
+    catalog_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sources.json')
+    max_age = 86400
+    fields = ('category', 'language', 'country')
+    sources = []
+    by_id = {}
+    by_name = {}
+    positions = {}
+    index = {}
+    loaded_at = 0
+    lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        '''Make sure the catalog is loaded, reading the local copy or refreshing it from News API once it is a day old.
+        A stale local copy is used if News API cannot be reached. Concurrent callers wait for a single refresh.
+
+        Returns:
+            list: The return value. Source JSON objects in News API order.
+        '''
+        if len(cls.sources) > 0 and time.time() - cls.loaded_at < cls.max_age:
+            return cls.sources
+        with cls.lock:
+            if len(cls.sources) > 0 and time.time() - cls.loaded_at < cls.max_age:
+                return cls.sources
+            return cls.refresh()
+
+    @classmethod
+    def refresh(cls):
+        '''Read the local copy of the catalog, or refresh it from News API once it is a day old or unreadable.
+
+        Returns:
+            list: The return value. Source JSON objects in News API order.
+        '''
+        import json
+        saved = cls.read()
+        if saved is not None and time.time() - saved['fetched_at'] < cls.max_age:
+            cls.build(saved['sources'], saved['fetched_at'])
+            return cls.sources
+        try:
+            sources = News.get_sources()
+        except Exception:
+            if saved is None:
+                raise
+            cls.build(saved['sources'], time.time())
+            return cls.sources
+        fetched_at = time.time()
+        temp = f'{cls.catalog_path}.tmp'
+        with open(temp, 'w') as file:
+            json.dump({'fetched_at': fetched_at, 'sources': sources}, file)
+        os.replace(temp, cls.catalog_path)
+        cls.build(sources, fetched_at)
+        return cls.sources
+
+    @classmethod
+    def read(cls):
+        '''Read the local copy of the catalog.
+
+        Returns:
+            dictionary: The return value. Fetch time and sources. None if the copy is missing, truncated or corrupt.
+        '''
+        import json
+        try:
+            with open(cls.catalog_path) as file, Metrics.timer('decode_seconds', format='json'):
+                saved = json.load(file)
+            if not isinstance(saved['fetched_at'], (int, float)) or not isinstance(saved['sources'], list):
+                return None
+            return saved
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def build(cls, sources, loaded_at):
+        '''Index the given sources by ID, lower case name, category, language and country.
+
+        Args:
+            sources: Source JSON objects.
+            loaded_at: Time the sources were fetched from News API.
+        '''
+        index = {x: {} for x in cls.fields}
+        for source in sources:
+            for field in cls.fields:
+                value = (source.get(field) or '').lower()
+                index[field].setdefault(value, set()).add(source['id'])
+        cls.by_id = {x['id']: x for x in sources}
+        cls.positions = {x['id']: i for i, x in enumerate(sources)}
+        cls.by_name = {x['name'].lower(): x for x in sources}
+        cls.index = index
+        cls.loaded_at = loaded_at
+        cls.sources = sources
+
+    @classmethod
+    def select(cls, expression):
+        '''Find the sources matching a filter such as `category=technology country=us,gb`.
+        Every condition must match. Comma separated values match any of them. Names match when they contain the value.
+
+        Args:
+            expression: Space separated field=value conditions on category, language, country, id or name.
+
+        Returns:
+            set: The return value. IDs of the matching sources.
+        '''
+        cls.load()
+        matches = set(cls.by_id)
+        for condition in expression.split():
+            field, sep, values = condition.partition('=')
+            field = field.lower()
+            values = [x for x in values.lower().split(',') if x != '']
+            if sep == '' or len(values) == 0:
+                raise ValueError(f'Invalid condition: {condition}')
+            if field in cls.index:
+                found = set().union(*(cls.index[field].get(x, set()) for x in values))
+            elif field == 'id':
+                found = {x for x in values if x in cls.by_id}
+            elif field == 'name':
+                found = {source['id'] for name, source in cls.by_name.items()
+                         if any(x in name for x in values)}
+            else:
+                raise ValueError(f'Unknown field: {field}')
+            matches &= found
+        return matches
+
+    @classmethod
+    def names(cls, ids):
+        '''Look up the names of the given source IDs in catalog order.
+
+        Args:
+            ids: Collection of source IDs.
+
+        Returns:
+            list: The return value. Names of the sources that are in the catalog.
+        '''
+        cls.load()
+        ids = sorted((x for x in ids if x in cls.by_id), key=cls.positions.get)
+        return [cls.by_id[x]['name'] for x in ids]
@@ -0,0 +1,529 @@
+import http.server
+import json
+import os
+import socketserver
+import sys
+import threading
+
+from article import Article
+from db import DB
+from dedup import Dedup
+from metrics import Metrics
+from news import Catalog, Memo, News
+from session import Sessions
+from transfer import Transfer
+from trends import Trends
+
+
+class RequestError(Exception):
+    '''RequestError class
+    Provides an error answered to the client with the given HTTP status.
+    '''
+
+    def __init__(self, status, message):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            status: HTTP status code.
+            message: Error message for the client.
+        '''
+        super().__init__(message)
+        self.status = status
+
+
+class PooledHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    '''PooledHTTPServer class
+    Provides an HTTP server answering connections on a bounded pool of threads, so threads and their database connections are reused.
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, threads):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            address: Tuple of host and port to listen on.
+            handler: Request handler class.
+            threads: Maximum number of connections answered at once.
+        '''
+        import concurrent.futures
+        super().__init__(address, handler)
+        self.pool = concurrent.futures.ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        '''Answer a connection on the pool.
+
+        Args:
+            request: Connected socket.
+            client_address: Address of the client.
+        '''
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        '''Stop listening and stop the pool once the open connections are answered.'''
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class Server:
+    '''Server class
+    Provides a JSON API over HTTP serving many users from one process.
+    Each user's state lives in a session found by its token, while the News memo, the sources catalog, the database connections and the password hash workers are shared by every session.
+    '''
+
+    threads = 32
+    workers = os.cpu_count() or 1
+    idle_timeout = 30
+    max_body = 1024 * 1024
+    saved_limit = 20
+    archive = False
+    offline = False
+    recorded = Memo(1024, News.memo.ttl)
+    routes = {('POST', '/session'): 'login',
+              ('GET', '/session'): 'session',
+              ('DELETE', '/session'): 'logout',
+              ('PUT', '/session/sources'): 'choose_sources',
+              ('POST', '/users'): 'register',
+              ('GET', '/sources'): 'sources',
+              ('GET', '/search'): 'search',
+              ('GET', '/trending'): 'trending',
+              ('GET', '/saved'): 'saved',
+              ('POST', '/saved'): 'save',
+              ('DELETE', '/saved/'): 'remove'}
+
+    @classmethod
+    def logged_in(cls, session):
+        '''Check that a user is logged in to the given session.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+
+        Returns:
+            int: The return value. User ID. Raises RequestError if no user is logged in.
+        '''
+        if session is None or session.user_id == -1:
+            raise RequestError(401, 'Log in first.')
+        return session.user_id
+
+    @classmethod
+    def credentials(cls, body):
+        '''Read the user name and password from a request body.
+
+        Args:
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. User name and password. Raises RequestError if either is missing.
+        '''
+        username = body.get('username')
+        password = body.get('password')
+        if not isinstance(username, str) or not isinstance(password, str) or username == '':
+            raise RequestError(400, 'Missing username or password.')
+        return username, password
+
+    @classmethod
+    def describe(cls, session):
+        '''Describe a session to its client.
+
+        Args:
+            session: Target session.
+
+        Returns:
+            dictionary: The return value. Token, user ID and chosen source IDs.
+        '''
+        return {'token': session.token, 'user_id': session.user_id,
+                'sources': sorted(session.source_ids)}
+
+    @classmethod
+    def login(cls, session, params, body):
+        '''Start a session, logged in if the body holds credentials. A session sending its token is logged in instead of replaced,
+        and is left as it is if the body holds no credentials. Logging out is DELETE /session.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and session description.
+        '''
+        user_id = -1
+        if 'username' in body or 'password' in body:
+            user_id = DB.auth_user(*cls.credentials(body))
+            if user_id == -1:
+                raise RequestError(401, 'Invalid credentials.')
+        if session is None:
+            session = Sessions.open(user_id)
+            return 201, cls.describe(session)
+        if user_id != -1:
+            session.user_id = user_id
+        return 200, cls.describe(session)
+
+    @classmethod
+    def register(cls, session, params, body):
+        '''Create an account and log it in.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and session description.
+        '''
+        user_id = DB.add_user(*cls.credentials(body))
+        if user_id == -1:
+            raise RequestError(409, 'User already exists.')
+        if session is None:
+            session = Sessions.open(user_id)
+        session.user_id = user_id
+        return 201, cls.describe(session)
+
+    @classmethod
+    def session(cls, session, params, body):
+        '''Describe the session of the request.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and session description.
+        '''
+        if session is None:
+            raise RequestError(401, 'Start a session first.')
+        return 200, cls.describe(session)
+
+    @classmethod
+    def logout(cls, session, params, body):
+        '''End the session of the request.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and empty object.
+        '''
+        if session is not None:
+            Sessions.close(session.token)
+        return 200, {}
+
+    @classmethod
+    def sources(cls, session, params, body):
+        '''List the available sources, optionally matching a filter such as `category=technology country=us`.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and sources.
+        '''
+        sources = Catalog.load()
+        if params.get('filter'):
+            ids = Catalog.select(params['filter'])
+            sources = [x for x in sources if x['id'] in ids]
+        return 200, {'sources': sources}
+
+    @classmethod
+    def choose_sources(cls, session, params, body):
+        '''Choose the sources searched by the session, as a list of IDs, a filter, or `All`.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and session description.
+        '''
+        if session is None:
+            raise RequestError(401, 'Start a session first.')
+        sources = body.get('sources')
+        if isinstance(sources, str) and sources.lower() == 'all':
+            ids = frozenset()
+        else:
+            if isinstance(sources, str):
+                ids = frozenset(Catalog.select(sources))
+            elif isinstance(sources, list):
+                Catalog.load()
+                ids = frozenset(x for x in sources if x in Catalog.by_id)
+            else:
+                raise RequestError(400, 'Give sources as a list of IDs, a filter or All.')
+            if len(ids) == 0:
+                raise RequestError(400, 'No sources selected.')
+        session.source_ids = ids
+        return 200, cls.describe(session)
+
+    @classmethod
+    def record(cls, term, sources, page, articles):
+        '''Count fetched articles into the trends and store them in the local archive when archiving is enabled.
+        A page is recorded once per News memo ttl, however many sessions request it. Recorded pages are kept apart from the News memo, so they do not evict search results.
+
+        Args:
+            term: Searched term.
+            sources: Searched source IDs.
+            page: Page number.
+            articles: Articles of the page.
+        '''
+        def load():
+            Trends.ingest(articles)
+            if cls.archive:
+                DB.archive_articles(articles)
+
+        if cls.offline or len(articles) == 0:
+            return
+        cls.recorded.get((*News.memo_key(term, sources), page), load)
+
+    @classmethod
+    def search(cls, session, params, body):
+        '''Search a page of articles matching the term q, grouped into stories.
+        The sources parameter overrides the sources chosen by the session.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code, page number, total results and stories as lists of articles.
+        '''
+        term = params.get('q', '').strip()
+        if term == '':
+            raise RequestError(400, 'Missing q.')
+        page = int(params.get('page', 1))
+        if page < 1:
+            raise ValueError(f'Invalid page {page}.')
+        if 'sources' in params:
+            sources = [x for x in params['sources'].split(',') if x]
+        else:
+            sources = sorted(session.source_ids) if session is not None else []
+        if cls.offline:
+            articles = DB.search_archive(term, sources, News.page_size) if page == 1 else []
+            total = len(articles)
+        else:
+            with Metrics.timer('search_seconds', mode='server'):
+                res = News.request_page(term, sources, page)
+            articles = [Article.from_json(x) for x in res.get('articles', [])]
+            total = res.get('totalResults', 0)
+            cls.record(term, sources, page, articles)
+        stories = Dedup.cluster(articles)
+        return 200, {'page': page, 'total': total,
+                     'stories': [[x.to_json() for x in story] for story in stories]}
+
+    @classmethod
+    def trending(cls, session, params, body):
+        '''List the most spiking terms, or sources if kind is source.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and trends.
+        '''
+        kind = params.get('kind', 'term')
+        if kind not in Trends.kinds:
+            raise ValueError(f'Unknown kind {kind}.')
+        limit = int(params.get('limit', Trends.limit))
+        trends = [{kind: name, 'recent': recent, 'expected': round(expected, 2), 'ratio': round(ratio, 2)}
+                  for name, recent, expected, ratio in Trends.trending(kind, limit)]
+        return 200, {'trends': trends}
+
+    @classmethod
+    def saved(cls, session, params, body):
+        '''List the saved articles of the logged in user, each with its saved article ID, or full text search them with q.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and articles. Searched articles come with a highlighted snippet.
+        '''
+        user_id = cls.logged_in(session)
+        if params.get('q', '').strip():
+            found = DB.search_saved(user_id, params['q'],
+                                    int(params.get('limit', cls.saved_limit)))
+            return 200, {'articles': [{'id': x, 'snippet': z, **y.to_json()} for x, y, z in found]}
+        return 200, {'articles': [{'id': x, **y.to_json()} for x, y in DB.iter_articles(user_id)]}
+
+    @classmethod
+    def save(cls, session, params, body):
+        '''Save the article in the body for the logged in user.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters.
+            body: Decoded JSON body in the News API article shape.
+
+        Returns:
+            tuple: The return value. Status code and empty object.
+        '''
+        user_id = cls.logged_in(session)
+        if not DB.add_article(user_id, Transfer.validate(body)):
+            raise RequestError(409, 'Already saved.')
+        return 201, {}
+
+    @classmethod
+    def remove(cls, session, params, body):
+        '''Remove a saved article of the logged in user.
+
+        Args:
+            session: Session of the request. None if the request has no token.
+            params: Query parameters. id holds the saved article ID from the path.
+            body: Decoded JSON body.
+
+        Returns:
+            tuple: The return value. Status code and empty object.
+        '''
+        DB.delete_article(int(params['id']), cls.logged_in(session))
+        return 200, {}
+
+    @classmethod
+    def dispatch(cls, method, target, headers, body):
+        '''Answer a request with the route matching its method and path.
+
+        Args:
+            method: HTTP method.
+            target: Request path with query string.
+            headers: Request headers.
+            body: Raw request body.
+
+        Returns:
+            tuple: The return value. Status code and JSON serializable object.
+        '''
+        import urllib.error
+        import urllib.parse
+        parts = urllib.parse.urlsplit(target)
+        params = dict(urllib.parse.parse_qsl(parts.query))
+        path = parts.path.rstrip('/') or '/'
+        head, _, tail = path.rpartition('/')
+        if tail.isdigit():
+            params['id'] = tail
+            path = f'{head}/'
+        route = cls.routes.get((method, path))
+        status = 500
+        with Metrics.timer('server_request_seconds', route=route or 'none'):
+            try:
+                if route is None:
+                    allowed = any(x[1] == path for x in cls.routes)
+                    raise RequestError(405 if allowed else 404, f'No route for {method} {parts.path}.')
+                session = None
+                auth = headers.get('Authorization', '')
+                if auth.startswith('Bearer '):
+                    session = Sessions.get(auth[len('Bearer '):].strip())
+                    if session is None:
+                        raise RequestError(401, 'Session expired. Start a new one.')
+                try:
+                    body = json.loads(body) if body else {}
+                except ValueError:
+                    raise RequestError(400, 'Body is not JSON.')
+                if not isinstance(body, dict):
+                    raise RequestError(400, 'Body is not a JSON object.')
+                status, obj = getattr(cls, route)(session, params, body)
+            except RequestError as err:
+                status, obj = err.status, {'error': str(err)}
+            except ValueError as err:
+                status, obj = 400, {'error': str(err)}
+            except (RuntimeError, urllib.error.URLError) as err:
+                status, obj = 502, {'error': str(err)}
+            except Exception as err:
+                print(f'{method} {parts.path}: {err!r}', file=sys.stderr)
+                status, obj = 500, {'error': 'Internal error.'}
+        Metrics.count('server_requests_total', route=route or 'none', status=str(status))
+        return status, obj
+
+    @classmethod
+    def handler(cls):
+        '''Build the request handler class. Connections are kept alive between requests until idle_timeout.
+
+        Returns:
+            type: The return value. Subclass of BaseHTTPRequestHandler.
+        '''
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            timeout = cls.idle_timeout
+            disable_nagle_algorithm = True
+
+            def answer(self):
+                path = self.path.split('?', 1)[0]
+                if self.command == 'GET' and path in ('/metrics', '/metrics.json'):
+                    if path == '/metrics':
+                        self.send(200, Metrics.prometheus().encode(), 'text/plain; version=0.0.4')
+                    else:
+                        self.send(200, Metrics.json().encode(), 'application/json')
+                    return
+                length = self.headers.get('Content-Length') or '0'
+                if not length.strip().isdigit():
+                    self.close_connection = True
+                    self.send(400, json.dumps({'error': 'Invalid Content-Length.'}).encode())
+                    return
+                size = int(length)
+                if size > cls.max_body:
+                    self.close_connection = True
+                    self.send(413, json.dumps({'error': 'Body too large.'}).encode())
+                    return
+                body = self.rfile.read(size) if size > 0 else b''
+                status, obj = cls.dispatch(self.command, self.path, self.headers, body)
+                self.send(status, json.dumps(obj).encode())
+
+            def send(self, status, body, kind='application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PUT = do_DELETE = answer
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @classmethod
+    def serve(cls, port, host='127.0.0.1', threads=None, workers=None):
+        '''Serve the JSON API on a background thread, with metrics at /metrics (Prometheus) and /metrics.json.
+        Password hashes are computed on a pool of worker processes, started before the first request.
+
+        Args:
+            port: Port to listen on. 0 for any free port.
+            host: Address to listen on.
+            threads: Maximum number of connections answered at once. None for the threads class property.
+            workers: Number of password hash worker processes. None for one per CPU. 0 to hash on the answering thread.
+
+        Returns:
+            PooledHTTPServer: The return value. Running server. Call Server.stop with it to stop it.
+        '''
+        import concurrent.futures
+        import multiprocessing
+        workers = cls.workers if workers is None else workers
+        with DB.connection():
+            pass
+        if workers > 0:
+            DB.hash_pool = concurrent.futures.ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context('spawn'))
+            list(DB.hash_pool.map(abs, range(workers)))
+        server = PooledHTTPServer((host, port), cls.handler(), threads or cls.threads)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    @classmethod
+    def stop(cls, server):
+        '''Stop a server started by Server.serve and its password hash workers.
+
+        Args:
+            server: Running server.
+        '''
+        server.shutdown()
+        server.server_close()
+        if DB.hash_pool is not None:
+            DB.hash_pool.shutdown()
+            DB.hash_pool = None
@@ -0,0 +1,102 @@
+import collections
+import threading
+import time
+
+
+class Session:
+    '''Session class
+    Provides the state of one user's session, so many sessions can share a process.
+    '''
+
+    def __init__(self, user_id=-1, source_ids=frozenset()):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            user_id: ID of the logged in user. -1 if logged out.
+            source_ids: IDs of the chosen news sources. Empty for all sources.
+        '''
+        self.user_id = user_id
+        self.source_ids = source_ids
+        self.token = None
+        self.used_at = time.monotonic()
+
+
+class Sessions:
+    '''Sessions class
+    Provides the sessions of a server by token. Sessions idle for longer than ttl expire, and the least recently used are dropped beyond max_sessions.
+    '''
+
+    ttl = 3600
+    max_sessions = 10000
+    token_bytes = 24
+    sessions = collections.OrderedDict()
+    lock = threading.Lock()
+
+    @classmethod
+    def open(cls, user_id=-1):
+        '''Start a session under a new random token.
+
+        Args:
+            user_id: ID of the logged in user. -1 to start logged out.
+
+        Returns:
+            Session: The return value. New session.
+        '''
+        import secrets
+        session = Session(user_id)
+        session.token = secrets.token_urlsafe(cls.token_bytes)
+        with cls.lock:
+            cls.prune()
+            cls.sessions[session.token] = session
+            while len(cls.sessions) > cls.max_sessions:
+                cls.sessions.popitem(last=False)
+        return session
+
+    @classmethod
+    def get(cls, token):
+        '''Find the live session of the given token and mark it as used.
+
+        Args:
+            token: Session token.
+
+        Returns:
+            Session: The return value. None if the token is unknown or expired.
+        '''
+        now = time.monotonic()
+        with cls.lock:
+            session = cls.sessions.get(token)
+            if session is None:
+                return None
+            if now - session.used_at >= cls.ttl:
+                del cls.sessions[token]
+                return None
+            session.used_at = now
+            cls.sessions.move_to_end(token)
+        return session
+
+    @classmethod
+    def close(cls, token):
+        '''End the session of the given token.
+
+        Args:
+            token: Session token.
+        '''
+        with cls.lock:
+            cls.sessions.pop(token, None)
+
+    @classmethod
+    def prune(cls):
+        '''Drop the expired sessions. Sessions are kept in order of last use, so only the expired ones are visited. Call with the lock held.
+
+        Returns:
+            int: The return value. Number of sessions dropped.
+        '''
+        oldest = time.monotonic() - cls.ttl
+        dropped = 0
+        while len(cls.sessions) > 0:
+            token, session = next(iter(cls.sessions.items()))
+            if session.used_at > oldest:
+                break
+            del cls.sessions[token]
+            dropped += 1
+        return dropped
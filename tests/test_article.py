@@ -0,0 +1,38 @@
+'''Unit tests of the article model.'''
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article import Article
+
+JSON = {'source': {'id': 'bbc-news', 'name': 'BBC News'}, 'author': 'Author', 'title': 'Volcano erupts',
+        'description': 'Ash falls on the town.', 'url': 'https://news.example.com/1',
+        'publishedAt': '2024-01-01T00:00:00Z', 'content': 'Ash fell overnight — residents left.'}
+
+
+class ArticleTest(unittest.TestCase):
+
+    def test_json_round_trip(self):
+        self.assertEqual(Article.from_json(JSON).to_json(), JSON)
+        self.assertEqual(Article.from_json({'url': 'https://x'}).to_json()['source'], {'id': None, 'name': None})
+
+    def test_pack_round_trip(self):
+        for article in (Article.from_json(JSON), Article('https://x', title='')):
+            self.assertEqual(Article.unpack(article.pack()), article)
+        self.assertEqual(Article.unpack(memoryview(Article.from_json(JSON).pack())), Article.from_json(JSON))
+
+    def test_equal_articles_share_a_hash(self):
+        first = Article.from_json(JSON)
+        second = Article.from_json(JSON)
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertEqual(len({first, second, Article('https://x')}), 2)
+        self.assertNotEqual(first, Article.from_json({**JSON, 'title': 'Volcano sleeps'}))
+        self.assertNotEqual(first, JSON)
+        self.assertEqual(repr(first), "Article('https://news.example.com/1', title='Volcano erupts')")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+'''Unit tests of recording News API responses to a cassette and replaying them.'''
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cassette import Cassette
+
+URL = 'https://newsapi.org/v2/top-headlines?q={}&apiKey={}'
+
+
+class CassetteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'news.cassette')
+
+    def record(self, responses, close=True):
+        cassette = Cassette(self.path, 'record')
+        for url, status, body in responses:
+            cassette.record_response(url, status, {'ETag': f'"{len(body)}"', 'Content-Encoding': 'gzip',
+                                                   'Set-Cookie': 'secret'}, body, 0.25)
+        if close:
+            cassette.close()
+        else:
+            cassette.file.flush()
+        return cassette
+
+    def replay(self, latency=0):
+        cassette = Cassette(self.path, 'replay', latency)
+        self.addCleanup(cassette.close)
+        return cassette
+
+    def test_round_trip(self):
+        responses = [(URL.format(x, 'key'), 200, f'{{"term": {x}}}'.encode()) for x in range(50)]
+        self.record(responses + [(URL.format(3, 'key'), 429, b'later')])
+        cassette = self.replay()
+        for url, status, body in responses[:3] + responses[4:]:
+            status, headers, found = cassette.replay(url.replace('key', 'other').replace('newsapi.org', 'localhost'))
+            self.assertEqual((status, found), (200, body))
+            self.assertEqual(headers['ETag'], f'"{len(body)}"')
+            self.assertIsNone(headers['Content-Encoding'])
+            self.assertIsNone(headers['Set-Cookie'])
+        self.assertEqual(cassette.replay(URL.format(3, 'key'))[::2], (429, b'later'))
+
+    def test_missing_response(self):
+        self.record([(URL.format('volcano', 'key'), 200, b'{}')])
+        with self.assertRaisesRegex(RuntimeError, 'No recorded response for top-headlines'):
+            self.replay().replay(URL.format('senate', 'key'))
+
+    def test_hash_collisions(self):
+        with mock.patch.object(Cassette, 'hash', classmethod(lambda cls, key: 7)):
+            self.record([(URL.format(x, 'key'), 200, str(x).encode()) for x in range(10)])
+            cassette = self.replay()
+            self.assertEqual([cassette.replay(URL.format(x, 'key'))[2] for x in range(10)],
+                             [str(x).encode() for x in range(10)])
+            with self.assertRaises(RuntimeError):
+                cassette.replay(URL.format(10, 'key'))
+
+    def test_unfinished_recording(self):
+        cassette = self.record([(URL.format(x, 'key'), 200, b'x' * 100) for x in range(3)], close=False)
+        cassette.file.close()
+        with open(self.path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.path) - 5)
+        replay = self.replay()
+        self.assertEqual(replay.replay(URL.format(1, 'key'))[2], b'x' * 100)
+        with self.assertRaises(RuntimeError):
+            replay.replay(URL.format(2, 'key'))
+
+    def test_corrupt_record(self):
+        self.record([(URL.format('volcano', 'key'), 200, b'{}')])
+        with open(self.path, 'r+b') as file:
+            file.seek(Cassette.header.size + Cassette.record.size + len(Cassette.key(URL.format('volcano', ''))))
+            file.write(b'\xff\xff\xff\xff')
+        with self.assertRaisesRegex(RuntimeError, 'Corrupt recorded response'):
+            self.replay().replay(URL.format('volcano', 'key'))
+
+    def test_not_a_cassette(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'\0' * 64)
+        with self.assertRaisesRegex(RuntimeError, 'is not a cassette'):
+            Cassette(self.path, 'replay')
+
+    def test_replays_recorded_latency(self):
+        self.record([(URL.format('volcano', 'key'), 200, b'{}')])
+        with mock.patch('cassette.time.sleep') as sleep:
+            self.replay(None).replay(URL.format('volcano', 'key'))
+            self.replay(0).replay(URL.format('volcano', 'key'))
+        self.assertEqual([x.args[0] for x in sleep.call_args_list], [0.25])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+'''Tests of the headless subcommands, run in process over a fresh SQLite database, checking their JSON lines and exit codes.'''
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article import Article
+from cli import CLI
+from db import DB
+from news import Catalog
+from trends import Trends
+
+SOURCES = [{'id': 'bbc-news', 'name': 'BBC News', 'category': 'general', 'language': 'en', 'country': 'gb'},
+           {'id': 'techcrunch', 'name': 'TechCrunch', 'category': 'technology', 'language': 'en', 'country': 'us'},
+           {'id': 'wired', 'name': 'Wired', 'category': 'technology', 'language': 'en', 'country': 'us'}]
+
+
+def article(num, title):
+    return {'source': {'id': 'bbc-news', 'name': 'BBC News'}, 'title': title, 'description': f'{title} report.',
+            'url': f'https://news.example.com/{num}', 'publishedAt': f'2024-01-0{num}T00:00:00Z'}
+
+
+class CLITest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_dsn = DB.dsn
+        DB.dsn = os.path.join(self.tmp.name, 'db.sqlite')
+        DB.add_user('alice', 'secret')
+        patch = mock.patch.dict(os.environ, {'TNS_PASSWORD': 'secret'})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        DB.storages.pop(DB.dsn).close()
+        DB.migrated.discard(DB.dsn)
+        DB.dsn = self.saved_dsn
+        self.tmp.cleanup()
+
+    def run_cli(self, *argv):
+        '''Run the command line and return its exit code, JSON lines written to stdout and stderr text.'''
+        out = io.StringIO()
+        err = io.StringIO()
+        code = 0
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                CLI.run(CLI.parser().parse_args(argv))
+            except SystemExit as exit:
+                code = exit.code if isinstance(exit.code, int) else 1
+                if isinstance(exit.code, str):
+                    err.write(exit.code)
+        return code, [json.loads(x) for x in out.getvalue().splitlines()], err.getvalue()
+
+    def write(self, name, lines):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as file:
+            file.write(''.join(f'{x}\n' for x in lines))
+        return path
+
+    def test_saved_articles(self):
+        path = self.write('add.jsonl', [json.dumps(article(1, 'Volcano erupts near the harbor town')),
+                                        '# comment', json.dumps(article(2, 'Senate passes the railway budget'))])
+        self.assertEqual(self.run_cli('saved', '-u', 'alice', 'add', '-f', path),
+                         (0, [{'added': 2, 'skipped': 0, 'invalid': 0}], ''))
+        code, saved, err = self.run_cli('saved', '-u', 'alice', 'list')
+        self.assertEqual((code, err), (0, ''))
+        self.assertEqual([x['url'] for x in saved], ['https://news.example.com/2', 'https://news.example.com/1'])
+        self.assertEqual(self.run_cli('saved', '-u', 'alice', 'rm', str(saved[0]['id'])), (0, [], ''))
+        self.assertEqual(len(self.run_cli('saved', '-u', 'alice', 'list')[1]), 1)
+
+    def test_saved_add_reports_invalid_lines(self):
+        copy = article(3, 'Volcano erupts near the harbor town')
+        path = self.write('add.jsonl', [json.dumps(article(1, 'Volcano erupts near the harbor town')), '{not json',
+                                        json.dumps({'title': 'No link'}), json.dumps(copy)])
+        code, out, err = self.run_cli('saved', '-u', 'alice', 'add', '-f', path)
+        self.assertEqual((code, out), (1, [{'added': 1, 'skipped': 1, 'invalid': 2}]))
+        self.assertIn('Line 2: ', err)
+        self.assertIn('Line 3: missing url', err)
+        self.assertIn('2 invalid lines', err)
+
+    def test_invalid_credentials(self):
+        with mock.patch.dict(os.environ, {'TNS_PASSWORD': 'wrong'}):
+            self.assertEqual(self.run_cli('saved', '-u', 'alice', 'list'), (1, [], 'Invalid credentials.'))
+
+    def test_watches(self):
+        code, out, err = self.run_cli('watch', '-u', 'alice', 'add', 'volcano', '-s', 'wired,bbc-news', '-i', '30')
+        self.assertEqual(code, 0)
+        watch_id = out[0]['id']
+        self.assertEqual(self.run_cli('watch', '-u', 'alice', 'add', 'volcano', '-s', 'bbc-news,wired')[0], 1)
+        self.assertEqual(self.run_cli('watch', '-u', 'alice', 'list')[1],
+                         [{'id': watch_id, 'term': 'volcano', 'sources': 'bbc-news,wired', 'interval': 30,
+                           'unseen': 0}])
+        self.assertEqual(self.run_cli('watch', '-u', 'alice', 'rm', str(watch_id)), (0, [], ''))
+        self.assertEqual(self.run_cli('watch', '-u', 'alice', 'list'), (0, [], ''))
+
+    def test_offline_search(self):
+        DB.archive_articles([Article.from_json(article(1, 'Volcano erupts near the harbor town')),
+                             Article.from_json(article(2, 'Senate passes the railway budget'))])
+        code, out, err = self.run_cli('--offline', 'search', 'volcano', 'harbor')
+        self.assertEqual((code, [x['url'] for x in out]), (0, ['https://news.example.com/1']))
+
+    def test_sources(self):
+        path = os.path.join(self.tmp.name, 'sources.json')
+        with open(path, 'w') as file:
+            json.dump({'fetched_at': time.time(), 'sources': SOURCES}, file)
+        for name, value in (('catalog_path', path), ('sources', []), ('loaded_at', 0)):
+            self.addCleanup(setattr, Catalog, name, getattr(Catalog, name))
+            setattr(Catalog, name, value)
+        self.assertEqual(self.run_cli('sources'), (0, SOURCES, ''))
+        self.assertEqual([x['id'] for x in self.run_cli('sources', 'category=technology', 'name=wire')[1]], ['wired'])
+        self.assertEqual(self.run_cli('sources', 'color=red'), (1, [], 'Unknown field: color'))
+
+    def test_trending(self):
+        Trends.ingest([Article.from_json({**article(x, 'Volcano erupts'), 'publishedAt': None}) for x in range(1, 4)])
+        code, out, err = self.run_cli('trending', '-n', '1')
+        self.assertEqual((code, out), (0, [{'term': 'erupts', 'recent': 3, 'expected': 0, 'ratio': 4}]))
+        self.assertEqual(self.run_cli('trending', '--sources')[1][0]['source'], 'BBC News')
+
+
+if __name__ == '__main__':
+    unittest.main()
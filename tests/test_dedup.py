@@ -0,0 +1,69 @@
+'''Unit tests of URL canonicalization and near duplicate clustering.'''
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article import Article
+from dedup import Dedup
+
+
+class CanonicalUrlTest(unittest.TestCase):
+
+    def test_equivalent_links_share_a_form(self):
+        links = ['https://www.Example.com/story/?b=2&a=1&utm_source=feed#comments',
+                 'http://example.com/story?a=1&b=2&fbclid=x',
+                 ' https://example.com:443/story/?a=1&b=2 ']
+        self.assertEqual({Dedup.canonical_url(x) for x in links}, {'example.com/story?a=1&b=2'})
+
+    def test_keeps_what_tells_pages_apart(self):
+        self.assertEqual(Dedup.canonical_url('https://example.com:8080/story?id=7'), 'example.com:8080/story?id=7')
+        self.assertNotEqual(Dedup.canonical_url('https://example.com/story?id=7'),
+                            Dedup.canonical_url('https://example.com/story?id=8'))
+
+    def test_malformed_links(self):
+        self.assertEqual(Dedup.canonical_url('http://example.com:bad/x'), 'example.com/x')
+        self.assertEqual(Dedup.canonical_url(' http://[::1/x '), 'http://[::1/x')
+        self.assertEqual(Dedup.canonical_url(''), '')
+
+
+class LabelsTest(unittest.TestCase):
+
+    def keys(self, *texts):
+        return [(f'example.com/{i}', Dedup.fingerprint(x)) for i, x in enumerate(texts)]
+
+    def test_groups_near_duplicates(self):
+        keys = self.keys('Volcano erupts near the harbor town as residents flee the ash cloud tonight',
+                         'Senate passes the railway budget after a long night of debate',
+                         'Volcano erupts near the harbor town as residents flee the ash cloud',
+                         'Marathon runners cross the glacier in record time')
+        self.assertEqual(Dedup.labels(keys), [0, 1, 0, 3])
+
+    def test_groups_same_links_and_texts(self):
+        keys = self.keys('Volcano erupts', 'Senate debates', 'Volcano erupts', '')
+        keys[3] = ('example.com/1', keys[3][1])
+        self.assertIsNone(keys[3][1])
+        self.assertEqual(Dedup.labels(keys), [0, 1, 0, 1])
+
+    def test_known_items_are_not_compared(self):
+        keys = self.keys('Volcano erupts near the harbor town as residents flee the ash cloud tonight',
+                         'Volcano erupts near the harbor town as residents flee the ash cloud')
+        self.assertEqual(Dedup.labels(keys), [0, 0])
+        self.assertEqual(Dedup.labels(keys, known=2), [0, 1])
+
+    def test_cluster(self):
+        def article(url, title):
+            return Article(source_id=None, source='Source', author=None, title=title, description=None,
+                           url=url, published_at=None, content=None)
+
+        stories = Dedup.cluster([article('https://example.com/a', 'Volcano erupts near the harbor town tonight'),
+                                 article('https://example.com/a?utm_source=x', 'Another title entirely'),
+                                 article('https://example.com/b', 'Senate debates the railway budget'),
+                                 article('https://other.com/c', 'Volcano erupts near the harbor town')])
+        self.assertEqual([[x.url for x in story] for story in stories],
+                         [['https://example.com/a', 'https://other.com/c'], ['https://example.com/b']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+'''Unit tests of the memo collapsing concurrent calls and keeping recent results.'''
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from news import Memo
+
+
+class MemoTest(unittest.TestCase):
+
+    def test_keeps_results_until_ttl(self):
+        memo = Memo(4, 60)
+        calls = []
+        with mock.patch('news.time.monotonic', return_value=1000):
+            self.assertEqual(memo.get('a', lambda: calls.append(1) or 'first'), 'first')
+            self.assertEqual(memo.get('a', lambda: 'second'), 'first')
+            self.assertEqual(memo.get('a', lambda: 'fresh', max_age=0), 'fresh')
+        with mock.patch('news.time.monotonic', return_value=1061):
+            self.assertEqual(memo.get('a', lambda: 'expired'), 'expired')
+        self.assertEqual(calls, [1])
+        self.assertEqual(memo.stats(), {'hits': 1, 'misses': 3, 'coalesced': 0, 'evictions': 0, 'entries': 1})
+
+    def test_evicts_least_recently_used(self):
+        memo = Memo(2, 60)
+        memo.get('a', lambda: 1)
+        memo.get('b', lambda: 2)
+        memo.get('a', lambda: None)
+        memo.get('c', lambda: 3)
+        self.assertEqual(list(memo.entries), ['a', 'c'])
+        self.assertEqual(memo.stats(), {'hits': 1, 'misses': 3, 'coalesced': 0, 'evictions': 1, 'entries': 2})
+        memo.clear()
+        self.assertEqual(memo.stats()['entries'], 0)
+
+    def test_zero_ttl_keeps_nothing(self):
+        memo = Memo(2, 0)
+        memo.get('a', lambda: 1)
+        self.assertEqual(memo.get('a', lambda: 2), 2)
+        self.assertEqual(memo.stats()['entries'], 0)
+
+    def test_collapses_concurrent_calls(self):
+        memo = Memo(4, 0)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'shared'
+
+        leader = threading.Thread(target=lambda: results.append(memo.get('a', load)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(memo.get('a', load))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        while memo.stats()['coalesced'] < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+        self.assertEqual((calls, results), ([1], ['shared'] * 5))
+        self.assertEqual(memo.flights, {})
+
+    def test_failed_call_is_not_kept(self):
+        memo = Memo(4, 60)
+        with self.assertRaises(ValueError):
+            memo.get('a', lambda: int('x'))
+        self.assertEqual(memo.flights, {})
+        self.assertEqual(memo.get('a', lambda: 'ok'), 'ok')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+'''Tests of the JSON API, answered by a server on a free local port over a fresh SQLite database.'''
+import http.client
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import DB
+from server import Server
+from session import Sessions
+
+ARTICLE = {'source': {'id': 'source-1', 'name': 'Source 1'}, 'author': 'Author',
+           'title': 'Volcano erupts near the harbor town', 'description': 'Residents leave as ash falls.',
+           'url': 'https://news.example.com/volcano', 'publishedAt': '2024-01-01T00:00:00Z',
+           'content': 'Ash fell on the harbor town overnight.'}
+
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_dsn = DB.dsn
+        DB.dsn = os.path.join(self.tmp.name, 'db.sqlite')
+        iterations = DB.hash_iterations
+        DB.hash_iterations = 1
+        self.addCleanup(setattr, DB, 'hash_iterations', iterations)
+        self.server = Server.serve(0, workers=0)
+        self.cnx = http.client.HTTPConnection(*self.server.server_address[:2], timeout=10)
+
+    def tearDown(self):
+        self.cnx.close()
+        Server.stop(self.server)
+        DB.storages.pop(DB.dsn).close()
+        DB.migrated.discard(DB.dsn)
+        DB.dsn = self.saved_dsn
+        self.tmp.cleanup()
+
+    def call(self, method, path, body=None, token=None, raw=None):
+        headers = {'Content-Type': 'application/json'}
+        if token is not None:
+            headers['Authorization'] = f'Bearer {token}'
+        data = raw if raw is not None else None if body is None else json.dumps(body)
+        self.cnx.request(method, path, data, headers)
+        res = self.cnx.getresponse()
+        return res.status, json.loads(res.read())
+
+    def register(self, username='alice', password='secret'):
+        status, obj = self.call('POST', '/users', {'username': username, 'password': password})
+        self.assertEqual(status, 201)
+        return obj['token']
+
+    def test_register_and_login(self):
+        token = self.register()
+        status, obj = self.call('GET', '/session', token=token)
+        self.assertEqual((status, obj['token']), (200, token))
+        self.assertNotEqual(obj['user_id'], -1)
+        self.assertEqual(self.call('POST', '/users', {'username': 'alice', 'password': 'other'})[0], 409)
+        self.assertEqual(self.call('POST', '/users', {'username': 'bob'})[0], 400)
+        status, obj = self.call('POST', '/session', {'username': 'alice', 'password': 'secret'})
+        self.assertEqual(status, 201)
+        self.assertNotEqual(obj['token'], token)
+        self.assertEqual(self.call('POST', '/session', {'username': 'alice', 'password': 'wrong'})[0], 401)
+
+    def test_anonymous_session_logs_in(self):
+        self.register()
+        status, obj = self.call('POST', '/session')
+        self.assertEqual((status, obj['user_id']), (201, -1))
+        token = obj['token']
+        self.assertEqual(self.call('GET', '/saved', token=token)[0], 401)
+        status, obj = self.call('POST', '/session', {'username': 'alice', 'password': 'secret'}, token)
+        self.assertEqual((status, obj['token']), (200, token))
+        user_id = obj['user_id']
+        self.assertEqual(self.call('POST', '/session', {}, token)[1]['user_id'], user_id)
+
+    def test_logout(self):
+        token = self.register()
+        self.assertEqual(self.call('DELETE', '/session', token=token), (200, {}))
+        self.assertEqual(self.call('GET', '/session', token=token)[0], 401)
+        self.assertEqual(self.call('GET', '/session', token='unknown')[0], 401)
+        self.assertEqual(self.call('GET', '/session')[0], 401)
+
+    def test_expired_session(self):
+        token = self.register()
+        ttl = Sessions.ttl
+        Sessions.ttl = 0
+        self.addCleanup(setattr, Sessions, 'ttl', ttl)
+        self.assertEqual(self.call('GET', '/saved', token=token)[0], 401)
+
+    def test_saved_articles(self):
+        alice = self.register()
+        bob = self.register('bob')
+        self.assertEqual(self.call('POST', '/saved', ARTICLE, alice), (201, {}))
+        self.assertEqual(self.call('POST', '/saved', ARTICLE, alice)[0], 409)
+        self.assertEqual(self.call('POST', '/saved', {'title': 'No link'}, alice)[0], 400)
+        status, obj = self.call('GET', '/saved', token=alice)
+        self.assertEqual(status, 200)
+        self.assertEqual([x['url'] for x in obj['articles']], [ARTICLE['url']])
+        article_id = obj['articles'][0]['id']
+        found = self.call('GET', '/saved?q=volcano', token=alice)[1]['articles']
+        self.assertEqual([x['id'] for x in found], [article_id])
+        self.assertEqual(self.call('GET', '/saved', token=bob)[1], {'articles': []})
+        self.call('DELETE', f'/saved/{article_id}', token=bob)
+        self.assertEqual(len(self.call('GET', '/saved', token=alice)[1]['articles']), 1)
+        self.assertEqual(self.call('DELETE', f'/saved/{article_id}', token=alice), (200, {}))
+        self.assertEqual(self.call('GET', '/saved', token=alice)[1], {'articles': []})
+
+    def test_bad_requests(self):
+        self.assertEqual(self.call('GET', '/nowhere')[0], 404)
+        self.assertEqual(self.call('PUT', '/saved')[0], 405)
+        self.assertEqual(self.call('POST', '/users', raw='{not json')[0], 400)
+        self.assertEqual(self.call('POST', '/users', raw='[]')[0], 400)
+        self.assertEqual(self.call('GET', '/search')[0], 400)
+
+    def test_bad_content_length(self):
+        for length in ('abc', '-5'):
+            self.cnx.putrequest('POST', '/session')
+            self.cnx.putheader('Content-Length', length)
+            self.cnx.endheaders()
+            res = self.cnx.getresponse()
+            self.assertEqual((res.status, json.loads(res.read())), (400, {'error': 'Invalid Content-Length.'}))
+            self.cnx.close()
+
+    def test_body_too_large(self):
+        max_body = Server.max_body
+        Server.max_body = 10
+        self.addCleanup(setattr, Server, 'max_body', max_body)
+        self.assertEqual(self.call('POST', '/users', {'username': 'alice', 'password': 'secret'})[0], 413)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,256 @@
+'''Contract tests shared by the storage backends.
+
+Every test runs against a fresh SQLite file. The PostgreSQL variant runs against the server at the TNS_TEST_POSTGRES URI,
+or else a local stand-in started with pgserver when it is installed, and is skipped otherwise.
+'''
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article import Article
+from db import DB
+
+
+WORDS = ('harbor', 'election', 'glacier', 'orchestra', 'satellite', 'vineyard', 'cyclist', 'museum',
+         'drought', 'startup', 'telescope', 'bakery', 'railway', 'senate', 'reef', 'marathon')
+
+
+def article(num, title=None, source_id='source-1'):
+    words = [WORDS[(num * 5 + x * 3) % len(WORDS)] for x in range(6)]
+    return Article(source_id=source_id, source='Source 1', author='Author',
+                   title=title or f"{' '.join(words[:3]).capitalize()} story number {num}",
+                   description=f"{' '.join(words[3:])} report {num}.", url=f'https://news.example.com/{num}',
+                   published_at=f'2024-01-01T00:{num % 60:02d}:00Z', content=f"{' '.join(words)} {num}.")
+
+
+def copy_of(original, num):
+    copy = article(num)
+    copy.title, copy.description, copy.content = original.title, original.description, original.content
+    return copy
+
+
+class StorageContract:
+    '''Behavior every storage backend must share. Subclasses point DB.dsn at a fresh database in make_dsn.'''
+
+    def make_dsn(self):
+        raise NotImplementedError
+
+    def drop_dsn(self, dsn):
+        pass
+
+    def setUp(self):
+        self.saved_dsn = DB.dsn
+        DB.dsn = self.make_dsn()
+
+    def tearDown(self):
+        dsn = DB.dsn
+        storage = DB.storages.pop(dsn, None)
+        if storage is not None:
+            storage.close()
+            if hasattr(storage, 'pool'):
+                storage.pool.closeall()
+        DB.migrated.discard(dsn)
+        DB.dsn = self.saved_dsn
+        self.drop_dsn(dsn)
+
+    def test_migrates_to_latest_version(self):
+        storage = DB.storage()
+        with DB.connection() as cnx:
+            self.assertEqual(storage.version(cnx), len(DB.migrations[storage.name]))
+            DB.migrate(cnx)
+            self.assertEqual(storage.version(cnx), len(DB.migrations[storage.name]))
+
+    def test_users(self):
+        user_id = DB.add_user('alice', 'secret')
+        self.assertNotEqual(user_id, -1)
+        self.assertEqual(DB.add_user('alice', 'other'), -1)
+        self.assertEqual(DB.auth_user('alice', 'secret'), user_id)
+        self.assertEqual(DB.auth_user('alice', 'wrong'), -1)
+        self.assertEqual(DB.auth_user('bob', 'secret'), -1)
+
+    def test_concurrent_registrations_create_one_user(self):
+        results = []
+        barrier = threading.Barrier(8)
+        iterations = DB.hash_iterations
+        DB.hash_iterations = 1
+        self.addCleanup(setattr, DB, 'hash_iterations', iterations)
+
+        def register():
+            barrier.wait()
+            try:
+                results.append(DB.add_user('carol', 'secret'))
+            finally:
+                DB.sql_close()
+
+        threads = [threading.Thread(target=register) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        created = [x for x in results if x != -1]
+        self.assertEqual(len(created), 1)
+        self.assertEqual(results.count(-1), 7)
+        self.assertEqual(DB.auth_user('carol', 'secret'), created[0])
+
+    def test_saved_articles(self):
+        alice = DB.add_user('alice', 'secret')
+        bob = DB.add_user('bob', 'secret')
+        self.assertTrue(DB.add_article(alice, article(1)))
+        self.assertFalse(DB.add_article(alice, article(1)))
+        self.assertTrue(DB.add_article(bob, article(1)))
+        self.assertEqual(DB.add_articles(alice, [article(2), article(3)]), 2)
+        saved = DB.get_articles(alice)
+        self.assertEqual(sorted(x[1].url for x in saved), [article(x).url for x in (1, 2, 3)])
+        DB.delete_article(saved[0][0], bob)
+        self.assertEqual(len(DB.get_articles(alice)), 3)
+        DB.delete_article(saved[0][0], alice)
+        self.assertEqual(len(DB.get_articles(alice)), 2)
+        self.assertEqual(len(DB.get_articles(bob)), 1)
+
+    def test_near_duplicates_are_not_saved_twice(self):
+        alice = DB.add_user('alice', 'secret')
+        self.assertTrue(DB.add_article(alice, article(1)))
+        self.assertFalse(DB.add_article(alice, copy_of(article(1), 2)))
+        self.assertEqual(DB.add_articles(alice, [article(3), copy_of(article(3), 4)]), 1)
+        DB.delete_article(DB.get_articles(alice)[-1][0], alice)
+        self.assertTrue(DB.add_article(alice, copy_of(article(1), 2)))
+        bob = DB.add_user('bob', 'secret')
+        self.assertEqual(DB.import_rows(bob, [DB.article_row(article(5))]), 1)
+        self.assertFalse(DB.add_article(bob, copy_of(article(5), 6)))
+
+    def test_search_saved(self):
+        alice = DB.add_user('alice', 'secret')
+        bob = DB.add_user('bob', 'secret')
+        DB.add_article(alice, article(1, title='Volcano erupts near town'))
+        DB.add_article(bob, article(2, title='Volcano quiet again'))
+        found = DB.search_saved(alice, 'volcano', 10, ('<', '>'))
+        self.assertEqual([x[1].url for x in found], [article(1).url])
+        self.assertIn('<Volcano>', found[0][2])
+        self.assertEqual(DB.search_saved(alice, 'glacier'), [])
+
+    def test_archive(self):
+        alice = DB.add_user('alice', 'secret')
+        DB.archive_articles([article(1, title='Volcano one'),
+                             article(2, title='Volcano two', source_id='source-2')])
+        DB.add_article(alice, article(3, title='Volcano saved'))
+        self.assertEqual(sorted(x.url for x in DB.search_archive('volcano', [])),
+                         [article(1).url, article(2).url])
+        self.assertEqual([x.url for x in DB.search_archive('volcano', ['source-2'])], [article(2).url])
+        DB.delete_article(DB.get_articles(alice)[0][0], alice)
+        DB.prune_archive()
+        self.assertEqual(DB.sql_select('SELECT COUNT(*) FROM articles', ())[0][0], 2)
+
+    def test_export_and_import(self):
+        alice = DB.add_user('alice', 'secret')
+        bob = DB.add_user('bob', 'secret')
+        DB.add_articles(alice, [article(x) for x in range(5)])
+        first = DB.export_articles(alice, 0, 3)
+        rest = DB.export_articles(alice, first[-1][0], 3)
+        self.assertEqual(len(first) + len(rest), 5)
+        rows = [DB.article_row(x[1]) for x in first + rest]
+        self.assertEqual(DB.import_rows(bob, rows), 5)
+        self.assertEqual(DB.import_rows(bob, rows), 0)
+
+    def test_watches(self):
+        alice = DB.add_user('alice', 'secret')
+        watch_id = DB.add_watch(alice, 'volcano', ['source-2', 'source-1'], 900)
+        self.assertNotEqual(watch_id, -1)
+        self.assertEqual(DB.add_watch(alice, 'volcano', 'source-1,source-2', 900), -1)
+        self.assertEqual(DB.get_watches(alice)[0][:4], (watch_id, 'volcano', 'source-1,source-2', 900))
+        self.assertEqual([x[0] for x in DB.due_watches(time.time() + 1)], [watch_id])
+        DB.record_watch(watch_id, [article(1), article(2)], article(2).published_at, '', time.time() + 900)
+        found = DB.watch_articles(alice)
+        self.assertEqual(len(found), 2)
+        DB.mark_seen(alice, [found[0][0]])
+        self.assertEqual(len(DB.watch_articles(alice)), 1)
+        self.assertEqual(len(DB.watch_articles(alice, False)), 2)
+        DB.delete_watch(watch_id, alice)
+        self.assertEqual(DB.get_watches(alice), [])
+
+    def test_trend_hours(self):
+        keys = [-2 ** 63, 0, 2 ** 63 - 1]
+        self.assertEqual(DB.new_trend_keys(keys), keys)
+        sketch = bytes(range(16))
+        DB.save_trend_hours([(100, 3, sketch, [('term', 'volcano', 3)])],
+                            [(x, 100) for x in keys[:2]], 90)
+        self.assertEqual(DB.new_trend_keys(keys), keys[2:])
+        hours = DB.get_trend_hours(100, 100)
+        self.assertEqual(bytes(hours[100][1]), sketch)
+        self.assertEqual((hours[100][0], hours[100][2]), (3, [('term', 'volcano', 3)]))
+        DB.save_trend_hours([], [], 101)
+        self.assertEqual(DB.get_trend_hours(0, 200), {})
+
+    def test_transaction_rolls_back(self):
+        with self.assertRaises(ValueError):
+            with DB.transaction():
+                DB.add_user('alice', 'secret')
+                raise ValueError('rollback')
+        self.assertEqual(DB.get_user('alice'), [])
+
+
+class SQLiteTest(StorageContract, unittest.TestCase):
+
+    def make_dsn(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        return os.path.join(self.tmp.name, 'db.sqlite')
+
+    def drop_dsn(self, dsn):
+        self.tmp.cleanup()
+
+
+class PostgresTest(StorageContract, unittest.TestCase):
+
+    server = None
+    counter = itertools.count()
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            import psycopg2
+        except ImportError:
+            raise unittest.SkipTest('psycopg2 is not installed')
+        cls.psycopg2 = psycopg2
+        cls.admin_dsn = os.environ.get('TNS_TEST_POSTGRES')
+        if cls.admin_dsn is None:
+            try:
+                import pgserver
+            except ImportError:
+                raise unittest.SkipTest('set TNS_TEST_POSTGRES or install pgserver')
+            cls.tmp = tempfile.TemporaryDirectory()
+            cls.server = pgserver.get_server(cls.tmp.name, cleanup_mode='stop')
+            cls.admin_dsn = cls.server.get_uri()
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.server is not None:
+            cls.server.cleanup()
+            cls.tmp.cleanup()
+
+    def admin(self, statement):
+        cnx = self.psycopg2.connect(self.admin_dsn)
+        try:
+            cnx.autocommit = True
+            cnx.cursor().execute(statement)
+        finally:
+            cnx.close()
+
+    def make_dsn(self):
+        import urllib.parse
+        name = f'tns_test_{os.getpid()}_{next(self.counter)}'
+        self.admin(f'CREATE DATABASE {name}')
+        parts = urllib.parse.urlsplit(self.admin_dsn)
+        return urllib.parse.urlunsplit((parts.scheme, parts.netloc, f'/{name}', parts.query, ''))
+
+    def drop_dsn(self, dsn):
+        import urllib.parse
+        self.admin(f'DROP DATABASE IF EXISTS {urllib.parse.urlsplit(dsn).path[1:]}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+'''Unit tests of decoding export lines and of exporting and importing saved articles through a fresh SQLite database.'''
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article import Article
+from db import DB
+from transfer import Transfer
+
+ARTICLES = [Article(f'https://news.example.com/{x}', source='Source 1', source_id='source-1', author='Author',
+                    title=title, description=f'{title} report.', published_at=f'2024-01-0{x + 1}T00:00:00Z',
+                    content=f'{title} in full.')
+            for x, title in enumerate(('Volcano erupts near town', 'Senate passes budget', 'Glacier retreats'))]
+
+
+def columns(articles):
+    return {'columns': {x: [getattr(y, x) for y in articles] for x in Transfer.fields}}
+
+
+class DecodeTest(unittest.TestCase):
+
+    def test_rows(self):
+        rows, errors = Transfer.decode([(x + 1, json.dumps(y.to_json())) for x, y in enumerate(ARTICLES[:2])])
+        self.assertEqual(rows, [DB.article_row(x) for x in ARTICLES[:2]])
+        self.assertEqual(errors, [])
+
+    def test_columns(self):
+        rows, errors = Transfer.decode([(1, json.dumps(columns(ARTICLES)))])
+        self.assertEqual(rows, [DB.article_row(x) for x in ARTICLES])
+        self.assertEqual(errors, [])
+
+    def test_invalid_lines(self):
+        broken = columns(ARTICLES)
+        del broken['columns']['url']
+        uneven = columns(ARTICLES)
+        uneven['columns']['title'].pop()
+        lines = ['{not json', json.dumps([1, 2]), json.dumps({'title': 'No link'}),
+                 json.dumps({'url': 'https://x', 'title': 7}), json.dumps(broken), json.dumps(uneven),
+                 json.dumps(ARTICLES[2].to_json())]
+        rows, errors = Transfer.decode(list(enumerate(lines, 1)))
+        self.assertEqual(rows, [DB.article_row(ARTICLES[2])])
+        self.assertEqual([x[0] for x in errors], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(errors[2:], [(3, 'missing url'), (4, 'title is not a string'),
+                                      (5, 'missing columns url'), (6, 'columns of different lengths')])
+
+    def test_read_chunks(self):
+        text = b'first\n\n  \nsecond\nthird\n'
+        chunk_size = Transfer.chunk_size
+        Transfer.chunk_size = 2
+        self.addCleanup(setattr, Transfer, 'chunk_size', chunk_size)
+        for data in (text, gzip.compress(text)):
+            chunks = list(Transfer.read_chunks(io.BufferedReader(io.BytesIO(data))))
+            self.assertEqual(chunks, [[(1, 'first\n'), (4, 'second\n')], [(5, 'third\n')]])
+
+
+class TransferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_dsn = DB.dsn
+        DB.dsn = os.path.join(self.tmp.name, 'db.sqlite')
+
+    def tearDown(self):
+        DB.storages.pop(DB.dsn).close()
+        DB.migrated.discard(DB.dsn)
+        DB.dsn = self.saved_dsn
+        self.tmp.cleanup()
+
+    def test_export_and_load(self):
+        alice = DB.add_user('alice', 'secret')
+        bob = DB.add_user('bob', 'secret')
+        DB.add_articles(alice, ARTICLES)
+        for format in Transfer.formats:
+            out = io.BytesIO()
+            self.assertEqual(Transfer.export(alice, out, format), 3)
+            errors = []
+            counts = Transfer.load(bob, io.BufferedReader(io.BytesIO(out.getvalue())), 1,
+                                   lambda *x: errors.append(x))
+            self.assertEqual(counts, (3, 3 if format == 'rows' else 0, 0))
+            self.assertEqual(errors, [])
+        self.assertEqual(sorted(x[1].url for x in DB.get_articles(bob)), [x.url for x in ARTICLES])
+        with self.assertRaises(ValueError):
+            Transfer.export(alice, io.BytesIO(), 'xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+'''Tests of the pooled HTTP transport against a local stand-in server answering scripted responses.'''
+import collections
+import gzip
+import http.server
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from news import Transport
+
+
+class StandIn(http.server.ThreadingHTTPServer):
+    '''HTTP server answering each request with the next scripted response and remembering the requests.'''
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.script = collections.deque()
+        self.requests = []
+        self.connections = 0
+
+    def answer(self, status=200, body=b'{}', headers=None, delay=0, drop=False):
+        '''Queue a response. drop closes the connection after it without telling the client.'''
+        self.script.append((status, body, headers or {}, delay, drop))
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        status, body, headers, delay, drop = self.server.script.popleft()
+        threading.Event().wait(delay)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = drop
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandIn()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        for name, value in (('backoff', 0.01), ('read_timeout', 2), ('cassette', None)):
+            self.addCleanup(setattr, Transport, name, getattr(Transport, name))
+            setattr(Transport, name, value)
+
+    def tearDown(self):
+        Transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_connections(self):
+        for _ in range(3):
+            self.server.answer(body=b'{"ok": true}')
+        for x in range(3):
+            status, headers, body = Transport.request(f'{self.url}/v2/top-headlines?page={x}')
+            self.assertEqual((status, body), (200, b'{"ok": true}'))
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual([x[0] for x in self.server.requests], [f'/v2/top-headlines?page={x}' for x in range(3)])
+        self.assertEqual(self.server.requests[0][1]['Accept-Encoding'], 'gzip')
+
+    def test_decompresses_gzip(self):
+        self.server.answer(body=gzip.compress(b'{"articles": []}'), headers={'Content-Encoding': 'gzip'})
+        self.assertEqual(Transport.request(f'{self.url}/')[2], b'{"articles": []}')
+
+    def test_passes_not_modified_through(self):
+        self.server.answer(304, b'', {'ETag': '"v1"'})
+        status, headers, body = Transport.request(f'{self.url}/', {'If-None-Match': '"v1"'})
+        self.assertEqual((status, headers['ETag'], body), (304, '"v1"', b''))
+        self.assertEqual(self.server.requests[0][1]['If-None-Match'], '"v1"')
+
+    def test_reconnects_after_dropped_connection(self):
+        self.server.answer(body=b'first', drop=True)
+        self.server.answer(body=b'second')
+        self.assertEqual(Transport.request(f'{self.url}/')[2], b'first')
+        time.sleep(0.1)
+        self.assertEqual(Transport.request(f'{self.url}/')[2], b'second')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_retries_server_errors(self):
+        self.server.answer(503)
+        self.server.answer(500)
+        self.server.answer(body=b'done')
+        with mock.patch('news.time.sleep') as sleep:
+            self.assertEqual(Transport.request(f'{self.url}/')[::2], (200, b'done'))
+        self.assertEqual([x.args[0] for x in sleep.call_args_list], [0.01, 0.02])
+
+    def test_gives_up_after_retries(self):
+        for _ in range(Transport.retries + 1):
+            self.server.answer(502)
+        with mock.patch('news.time.sleep'):
+            self.assertEqual(Transport.request(f'{self.url}/')[0], 502)
+        self.assertEqual(len(self.server.requests), Transport.retries + 1)
+
+    def test_honors_retry_after_up_to_a_cap(self):
+        self.server.answer(429, headers={'Retry-After': '2'})
+        self.server.answer(429, headers={'Retry-After': '3600'})
+        self.server.answer(429, headers={'Retry-After': 'soon'})
+        self.server.answer()
+        with mock.patch('news.time.sleep') as sleep:
+            self.assertEqual(Transport.request(f'{self.url}/')[0], 200)
+        self.assertEqual([x.args[0] for x in sleep.call_args_list], [2, Transport.max_retry_after, 0.04])
+
+    def test_times_out(self):
+        Transport.read_timeout = 0.2
+        for _ in range(Transport.retries + 1):
+            self.server.answer(delay=0.5)
+        with mock.patch('news.time.sleep'), self.assertRaises(socket.timeout):
+            Transport.request(f'{self.url}/')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+'''Unit tests of the top names and of trending terms and sources counted into a fresh SQLite database.'''
+import calendar
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article import Article
+from db import DB
+from trends import TopK, Trends
+
+NOW = calendar.timegm((2024, 3, 10, 12, 30, 0))
+
+
+def article(num, title, hours_ago=0, source='Source 1'):
+    published = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(NOW - hours_ago * 3600))
+    return Article(f'https://news.example.com/{num}', source=source, title=title, published_at=published)
+
+
+class TopKTest(unittest.TestCase):
+
+    def test_keeps_the_highest_counts(self):
+        top = TopK(3)
+        for name, count in (('a', 1), ('b', 5), ('c', 2), ('d', 1), ('e', 4), ('a', 6)):
+            top.offer(name, count)
+        self.assertEqual(top.counts, {'b': 5, 'e': 4, 'a': 6})
+
+    def test_updates_kept_names(self):
+        top = TopK(2, [('a', 1), ('b', 2)])
+        top.offer('a', 3)
+        top.offer('c', 2)
+        self.assertEqual(top.counts, {'a': 3, 'b': 2})
+
+
+class NamesTest(unittest.TestCase):
+
+    def test_hour(self):
+        self.assertEqual(Trends.hour('2024-03-10T12:45:00Z', 0), NOW // 3600)
+        self.assertEqual(Trends.hour('yesterday', 7), 7)
+        self.assertEqual(Trends.hour(None, 7), 7)
+
+    def test_names(self):
+        names = Trends.names(Article('https://x', source='Source 1', title='The volcano and the ash',
+                                     description=None))
+        self.assertEqual(names, {('term', 'volcano'), ('term', 'ash'), ('source', 'Source 1')})
+
+
+class TrendsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_dsn = DB.dsn
+        DB.dsn = os.path.join(self.tmp.name, 'db.sqlite')
+
+    def tearDown(self):
+        DB.storages.pop(DB.dsn).close()
+        DB.migrated.discard(DB.dsn)
+        DB.dsn = self.saved_dsn
+        self.tmp.cleanup()
+
+    def test_counts_each_page_once(self):
+        articles = [article(1, 'Volcano erupts'), article(2, 'Volcano smokes')]
+        self.assertEqual(Trends.ingest(articles, NOW), 2)
+        copy = Article('https://www.news.example.com/1/?utm_source=feed', title='Volcano erupts',
+                       published_at=articles[0].published_at)
+        self.assertEqual(Trends.ingest([copy, article(3, 'Old volcano', Trends.max_hours + 1)], NOW), 0)
+
+    def test_ranks_spiking_names(self):
+        articles = [article(x, 'Volcano erupts', x % 3) for x in range(6)]
+        articles += [article(10 + x, 'Senate debates', x % 3, 'Source 2') for x in range(4)]
+        articles += [article(20 + x, 'Senate debates budget', 10 + x, 'Source 2') for x in range(16)]
+        articles += [article(40, 'Glacier melts', 1)]
+        Trends.ingest(articles, NOW)
+        terms = Trends.trending('term', now=NOW)
+        self.assertEqual([x[:3] for x in terms], [('erupts', 6, 0), ('volcano', 6, 0),
+                                                  ('debates', 4, 2), ('senate', 4, 2)])
+        self.assertEqual(terms[2][3], 5 / 3)
+        self.assertEqual(Trends.trending('term', 1, NOW)[0][0], 'erupts')
+        self.assertEqual([x[:3] for x in Trends.trending('source', now=NOW)],
+                         [('Source 1', 7, 0), ('Source 2', 4, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
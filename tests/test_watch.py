@@ -0,0 +1,76 @@
+'''Unit tests of how watches are grouped into requests and pick new articles.'''
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article import Article
+from watch import Watch
+
+
+def article(num, published_at, title='Volcano erupts', description=None):
+    return Article(f'https://news.example.com/{num}', title=title, description=description,
+                   published_at=published_at)
+
+
+def watch(watch_id, term, sources):
+    return (watch_id, 1, term, sources, 900, None, '')
+
+
+class GroupTest(unittest.TestCase):
+
+    def test_coalesces_watches_by_sources(self):
+        watches = [watch(1, 'volcano', 'bbc-news,cnn'), watch(2, 'senate', 'bbc-news,cnn'),
+                   watch(3, 'volcano', ''), watch(4, 'volcano', ''), watch(5, 'senate', '')]
+        groups = Watch.group(watches)
+        self.assertEqual({x: [y[0] for y in z] for x, z in groups.items()},
+                         {('', 'bbc-news,cnn'): [1, 2], ('volcano', ''): [3, 4], ('senate', ''): [5]})
+
+
+class MatchesTest(unittest.TestCase):
+
+    def test_every_word_must_appear(self):
+        self.assertTrue(Watch.matches('volcano ASH', article(1, None, 'Volcano erupts', 'Ash falls')))
+        self.assertFalse(Watch.matches('volcano lava', article(1, None, 'Volcano erupts', 'Ash falls')))
+
+    def test_missing_fields_match_nothing(self):
+        self.assertFalse(Watch.matches('none', article(1, None, None, None)))
+
+
+class NewerTest(unittest.TestCase):
+
+    def test_first_poll_only_sets_the_mark(self):
+        new, high_water, urls = Watch.newer(None, set(), [article(1, '2024-01-01T10:00:00Z'),
+                                                          article(2, '2024-01-01T09:00:00Z')])
+        self.assertEqual((new, high_water, urls), ([], '2024-01-01T10:00:00Z', {'https://news.example.com/1'}))
+
+    def test_first_poll_without_dates_starts_now(self):
+        new, high_water, urls = Watch.newer(None, set(), [article(1, None)])
+        self.assertEqual((new, urls), ([], set()))
+        self.assertRegex(high_water, r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ$')
+
+    def test_picks_articles_after_the_mark(self):
+        seen = {'https://news.example.com/1'}
+        articles = [article(3, '2024-01-01T11:00:00Z'), article(2, '2024-01-01T10:00:00Z'),
+                    article(1, '2024-01-01T10:00:00Z'), article(0, '2024-01-01T09:00:00Z'), article(4, None)]
+        new, high_water, urls = Watch.newer('2024-01-01T10:00:00Z', seen, articles)
+        self.assertEqual([x.url for x in new], ['https://news.example.com/3', 'https://news.example.com/2'])
+        self.assertEqual((high_water, urls), ('2024-01-01T11:00:00Z', {'https://news.example.com/3'}))
+
+    def test_keeps_urls_seen_at_an_unchanged_mark(self):
+        seen = {'https://news.example.com/1'}
+        new, high_water, urls = Watch.newer('2024-01-01T10:00:00Z', seen, [article(2, '2024-01-01T10:00:00Z')])
+        self.assertEqual(len(new), 1)
+        self.assertEqual(urls, {'https://news.example.com/1', 'https://news.example.com/2'})
+
+    def test_filters_by_term(self):
+        articles = [article(1, '2024-01-01T11:00:00Z', 'Volcano erupts'),
+                    article(2, '2024-01-01T12:00:00Z', 'Senate debates')]
+        new, high_water, urls = Watch.newer('2024-01-01T10:00:00Z', set(), articles, 'volcano')
+        self.assertEqual([x.url for x in new], ['https://news.example.com/1'])
+        self.assertEqual(high_water, '2024-01-01T12:00:00Z')
+
+
+if __name__ == '__main__':
+    unittest.main()
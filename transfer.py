@@ -0,0 +1,178 @@
+import collections
+import gzip
+import itertools
+import json
+import os
+
+from article import Article
+from db import DB
+from metrics import Metrics
+
+
+class Transfer:
+    '''Transfer class
+    Provides bulk export and import of saved articles as gzip compressed JSON lines.
+    Rows are read and written in chunks so memory stays bounded, and imported lines are decoded and validated across a process pool.
+    '''
+
+    chunk_size = 1000
+    workers = os.cpu_count() or 1
+    formats = ('rows', 'columns')
+    fields = ('source_id', 'source', 'author', 'title',
+              'description', 'url', 'published_at', 'content')
+
+    @classmethod
+    def export(cls, user_id, file, format='rows'):
+        '''Write every saved article of the given user ID to the given file, oldest saved first.
+        The rows format writes one article per line in the News API shape. The columns format writes one chunk per line as a list of values per field.
+
+        Args:
+            user_id: Target user ID.
+            file: Binary file to write the gzip compressed lines to.
+            format: Either rows or columns.
+
+        Returns:
+            int: The return value. Number of articles exported.
+        '''
+        if format not in cls.formats:
+            raise ValueError(f'Unknown format {format}.')
+        count = 0
+        after = 0
+        with gzip.open(file, 'wt', encoding='utf-8') as out:
+            while True:
+                chunk = DB.export_articles(user_id, after, cls.chunk_size)
+                if len(chunk) == 0:
+                    break
+                after = chunk[-1][0]
+                articles = [x[1] for x in chunk]
+                if format == 'rows':
+                    out.writelines(json.dumps(x.to_json()) + '\n' for x in articles)
+                else:
+                    columns = {x: [getattr(y, x) for y in articles] for x in cls.fields}
+                    out.write(json.dumps({'columns': columns}) + '\n')
+                count += len(chunk)
+                Metrics.count('transfer_rows_total', len(chunk), direction='export')
+        return count
+
+    @classmethod
+    def validate(cls, obj):
+        '''Check an article object read from an export or a News API response.
+
+        Args:
+            obj: Decoded JSON value.
+
+        Returns:
+            Article: The return value. Parsed article. Raises ValueError if the object is not a valid article.
+        '''
+        if not isinstance(obj, dict):
+            raise ValueError('not an object')
+        if not isinstance(obj.get('url'), str) or obj['url'].strip() == '':
+            raise ValueError('missing url')
+        source = obj.get('source')
+        if source is not None and not isinstance(source, dict):
+            raise ValueError('source is not an object')
+        article = Article.from_json(obj)
+        for name in cls.fields:
+            value = getattr(article, name)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f'{name} is not a string')
+        return article
+
+    @classmethod
+    def decode(cls, lines):
+        '''Decode and validate a chunk of lines into rows of the articles table. Runs in the worker processes.
+
+        Args:
+            lines: List of tuples of line number and line.
+
+        Returns:
+            tuple: The return value. List of rows from DB.article_row and list of tuples of line number and error message.
+        '''
+        rows = []
+        errors = []
+        for number, line in lines:
+            try:
+                obj = json.loads(line)
+                if isinstance(obj, dict) and 'columns' in obj:
+                    columns = obj['columns']
+                    missing = [x for x in cls.fields if not isinstance(columns.get(x), list)]
+                    if len(missing) > 0:
+                        raise ValueError(f"missing columns {', '.join(missing)}")
+                    if len({len(columns[x]) for x in cls.fields}) > 1:
+                        raise ValueError('columns of different lengths')
+                    values = zip(*(columns[x] for x in cls.fields))
+                    objs = [Article(**dict(zip(cls.fields, x))).to_json() for x in values]
+                else:
+                    objs = [obj]
+                rows.extend(DB.article_row(cls.validate(x)) for x in objs)
+            except (ValueError, KeyError, TypeError) as err:
+                errors.append((number, str(err)))
+        return rows, errors
+
+    @classmethod
+    def read_chunks(cls, file):
+        '''Lazily split the given export file into chunks of numbered, non-blank lines.
+        Gzip compressed files are detected by their header, so plain JSON lines such as the output of `saved list` are accepted too.
+
+        Args:
+            file: Binary file to read.
+
+        Yields:
+            list: Tuples of line number and line.
+        '''
+        if file.peek(2)[:2] == b'\x1f\x8b':
+            file = gzip.GzipFile(fileobj=file)
+        lines = ((i, x.decode('utf-8')) for i, x in enumerate(file, 1) if x.strip())
+        chunk = list(itertools.islice(lines, cls.chunk_size))
+        while len(chunk) > 0:
+            yield chunk
+            chunk = list(itertools.islice(lines, cls.chunk_size))
+
+    @classmethod
+    def decoded(cls, chunks, workers):
+        '''Decode chunks across a process pool, keeping at most two chunks per worker in flight, in the order they were read.
+
+        Args:
+            chunks: Iterable of chunks from Transfer.read_chunks.
+            workers: Number of worker processes. 1 to decode in this process.
+
+        Yields:
+            tuple: Rows and errors of each chunk from Transfer.decode.
+        '''
+        if workers <= 1:
+            yield from map(cls.decode, chunks)
+            return
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append(pool.submit(cls.decode, chunk))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    @classmethod
+    def load(cls, user_id, file, workers=None, on_error=None):
+        '''Save every article of the given export file for the given user ID, one transaction per chunk.
+        Articles already saved by the user are skipped. Near duplicates are kept, so a backup restores what was saved.
+
+        Args:
+            user_id: Target user ID.
+            file: Binary file to read.
+            workers: Number of worker processes. None for one per CPU.
+            on_error: Function called with the line number and message of each invalid line.
+
+        Returns:
+            tuple: The return value. Number of articles read, saved and invalid lines.
+        '''
+        read = saved = invalid = 0
+        for rows, errors in cls.decoded(cls.read_chunks(file), workers or cls.workers):
+            saved += DB.import_rows(user_id, rows)
+            read += len(rows)
+            invalid += len(errors)
+            if on_error is not None:
+                for error in errors:
+                    on_error(*error)
+            Metrics.count('transfer_rows_total', len(rows), direction='import')
+        return read, saved, invalid
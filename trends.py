@@ -0,0 +1,261 @@
+import array
+import re
+import struct
+import time
+
+from db import DB
+from dedup import Dedup
+from metrics import Metrics
+
+
+class TopK:
+    '''TopK class
+    Provides the names with the highest counts offered so far, evicting the lowest when full.
+    '''
+
+    def __init__(self, k, counts=()):
+        '''Constructor - Assigns class properties.
+
+        Args:
+            k: Maximum number of names kept.
+            counts: Iterable of tuples of name and count to start from.
+        '''
+        self.k = k
+        self.counts = dict(counts)
+        self.floor = 0
+
+    def offer(self, name, count):
+        '''Keep the given name if it is already kept, there is room, or its count beats the lowest kept count.
+
+        Args:
+            name: Offered name.
+            count: Current count of the name.
+        '''
+        counts = self.counts
+        if name in counts or len(counts) < self.k:
+            counts[name] = count
+        elif count > self.floor:
+            lowest = min(counts, key=counts.get)
+            self.floor = counts[lowest]
+            if count > self.floor:
+                del counts[lowest]
+                counts[name] = count
+                self.floor = min(counts.values())
+
+
+class Trends:
+    '''Trends class
+    Provides trending terms and sources, aggregated incrementally per hour from fetched articles.
+    Each hour keeps a count-min sketch of how many articles mention each term or come from each source, and the top_k of each kind as candidates.
+    Aggregates older than max_hours are dropped, so memory and storage stay bounded however many articles are counted.
+    '''
+
+    enabled = True
+    width = 4096
+    depth = 4
+    top_k = 50
+    max_hours = 7 * 24
+    recent_hours = 6
+    baseline_hours = 48
+    min_count = 3
+    min_length = 3
+    limit = 20
+    kinds = ('term', 'source')
+    max_keys = 100000
+    keys = {}
+    digest = struct.Struct(f'<{depth}H')
+    article_key = struct.Struct('<q')
+    word_pattern = re.compile(r"[^\W\d_][\w'-]*")
+    stopwords = frozenset(
+        'about above after again against all also and any are because been before being below between both but can '
+        'could did does doing down during each few for from further had has have having her here hers herself him '
+        'himself his how into its itself just more most new news not now off once only other our ours out over own '
+        'said same says she should some such than that the their theirs them themselves then there these they this '
+        'those through too under until very was were what when where which while who whom why will with would you '
+        'your yours yourself'.split())
+
+    @classmethod
+    def hour(cls, published_at, default):
+        '''Find the hour an article was published in.
+
+        Args:
+            published_at: Publication date as an ISO 8601 string.
+            default: Hour used when the date is missing or malformed.
+
+        Returns:
+            int: The return value. Hours since the epoch.
+        '''
+        import calendar
+        try:
+            parts = (int(published_at[0:4]), int(published_at[5:7]), int(published_at[8:10]),
+                     int(published_at[11:13]), 0, 0)
+            return calendar.timegm(parts) // 3600
+        except (TypeError, ValueError):
+            return default
+
+    @classmethod
+    def key(cls, article):
+        '''Compute the 64 bit key under which an article is counted once, shared by every link to the same page.
+
+        Args:
+            article: Target article.
+
+        Returns:
+            int: The return value. Signed 64 bit key.
+        '''
+        import hashlib
+        digest = hashlib.blake2b(Dedup.canonical_url(
+            article.url).encode(), digest_size=8).digest()
+        return cls.article_key.unpack(digest)[0]
+
+    @classmethod
+    def names(cls, article):
+        '''List the distinct names an article is counted under.
+
+        Args:
+            article: Target article.
+
+        Returns:
+            set: The return value. Tuples of kind and name. Terms are the words of the title and description that are not stop words.
+        '''
+        text = f'{article.title or ""} {article.description or ""}'.lower()
+        names = {('term', x) for x in cls.word_pattern.findall(text)
+                 if len(x) >= cls.min_length and x not in cls.stopwords}
+        if article.source:
+            names.add(('source', article.source))
+        return names
+
+    @classmethod
+    def indexes(cls, kind, name):
+        '''Locate the counters of a name in a sketch, one per row.
+
+        Args:
+            kind: Either term or source.
+            name: Term or source name.
+
+        Returns:
+            tuple: The return value. Positions in the sketch array.
+        '''
+        key = (kind, name)
+        indexes = cls.keys.get(key)
+        if indexes is None:
+            import hashlib
+            digest = hashlib.blake2b(f'{kind}:{name}'.encode(),
+                                     digest_size=cls.digest.size).digest()
+            indexes = tuple(row * cls.width + x % cls.width
+                            for row, x in enumerate(cls.digest.unpack(digest)))
+            if len(cls.keys) >= cls.max_keys:
+                cls.keys.clear()
+            cls.keys[key] = indexes
+        return indexes
+
+    @classmethod
+    def sketch(cls, data=None):
+        '''Build a sketch array.
+
+        Args:
+            data: Packed sketch from the database. None for an empty sketch.
+
+        Returns:
+            array: The return value. depth rows of width 32 bit counters.
+        '''
+        sketch = array.array('I')
+        if data is None:
+            sketch.frombytes(bytes(4 * cls.width * cls.depth))
+        else:
+            sketch.frombytes(bytes(data))
+        return sketch
+
+    @classmethod
+    def estimate(cls, sketch, kind, name):
+        '''Estimate from a sketch how many articles were counted under a name. The estimate is never too low.
+
+        Args:
+            sketch: Sketch array.
+            kind: Either term or source.
+            name: Term or source name.
+
+        Returns:
+            int: The return value. Estimated count.
+        '''
+        return min(sketch[x] for x in cls.indexes(kind, name))
+
+    @classmethod
+    def ingest(cls, articles, now=None):
+        '''Count fetched articles into the aggregates of the hours they were published in.
+        Articles already counted, or published more than max_hours ago, are skipped. Articles without a date count in the current hour.
+
+        Args:
+            articles: Iterable of articles.
+            now: Current time. None for the clock.
+
+        Returns:
+            int: The return value. Number of articles counted.
+        '''
+        if not cls.enabled:
+            return 0
+        current = int((time.time() if now is None else now) // 3600)
+        oldest = current - cls.max_hours + 1
+        found = {}
+        for article in articles:
+            hour = min(cls.hour(article.published_at, current), current)
+            if hour >= oldest:
+                found.setdefault(cls.key(article), (hour, article))
+        if len(found) == 0:
+            return 0
+        with Metrics.timer('trends_ingest_seconds'), DB.transaction():
+            fresh = DB.new_trend_keys(list(found))
+            hours = {}
+            for key in fresh:
+                hour, article = found[key]
+                hours.setdefault(hour, []).append(article)
+            stored = DB.get_trend_hours(min(hours), max(hours)) if hours else {}
+            rows = []
+            for hour, group in hours.items():
+                count, data, top = stored.get(hour, (0, None, []))
+                sketch = cls.sketch(data)
+                tops = {x: TopK(cls.top_k, ((z, w) for y, z, w in top if y == x)) for x in cls.kinds}
+                for article in group:
+                    for kind, name in cls.names(article):
+                        indexes = cls.indexes(kind, name)
+                        for x in indexes:
+                            sketch[x] += 1
+                        tops[kind].offer(name, min(sketch[x] for x in indexes))
+                rows.append((hour, count + len(group), sketch.tobytes(),
+                             [(x, y, z) for x in cls.kinds for y, z in tops[x].counts.items()]))
+            DB.save_trend_hours(rows, [(x, found[x][0]) for x in fresh], oldest)
+        Metrics.count('trend_articles_total', len(fresh))
+        return len(fresh)
+
+    @classmethod
+    def trending(cls, kind='term', limit=None, now=None):
+        '''Rank the names spiking in the last recent_hours against the baseline_hours before them.
+        Candidates are the top names of the recent hours, and their counts are estimated from the stored sketches, so no article is rescanned.
+
+        Args:
+            kind: Either term or source.
+            limit: Maximum number of names. None for the limit class property.
+            now: Current time. None for the clock.
+
+        Returns:
+            list: The return value. Tuples of name, recent count, expected count and spike ratio, most spiking first.
+        '''
+        current = int((time.time() if now is None else now) // 3600)
+        first_recent = current - cls.recent_hours + 1
+        hours = DB.get_trend_hours(first_recent - cls.baseline_hours, current)
+        candidates = {y for x, (_, _, top) in hours.items() if x >= first_recent
+                      for z, y, _ in top if z == kind}
+        sketches = {x: cls.sketch(y[1]) for x, y in hours.items()}
+        trends = []
+        for name in candidates:
+            recent = baseline = 0
+            for hour, sketch in sketches.items():
+                if hour >= first_recent:
+                    recent += cls.estimate(sketch, kind, name)
+                else:
+                    baseline += cls.estimate(sketch, kind, name)
+            if recent >= cls.min_count:
+                expected = baseline * cls.recent_hours / cls.baseline_hours
+                trends.append((name, recent, expected, (recent + 1) / (expected + 1)))
+        trends.sort(key=lambda x: (-x[3], -x[1], x[0]))
+        return trends[:cls.limit if limit is None else limit]
@@ -0,0 +1,177 @@
+import sys
+import time
+
+from article import Article
+from db import DB
+from news import News
+from trends import Trends
+
+
+class Watch:
+    '''Watch class
+    Provides a scheduler that polls watched searches and stores only the articles published since the last poll.
+    Watches sharing the same sources are answered by one request.
+    '''
+
+    interval = 900
+    min_interval = 60
+    jitter = 0.1
+    coalesce_window = 60
+    page_size = 20
+    max_pages = 5
+    max_sleep = 300
+
+    @classmethod
+    def next_poll(cls, interval, now):
+        '''Schedule the next poll of a watch, spread by a random jitter so watches drift apart.
+
+        Args:
+            interval: Seconds between polls.
+            now: Time of the current poll.
+
+        Returns:
+            float: The return value. Time of the next poll.
+        '''
+        import random
+        interval = max(interval, cls.min_interval)
+        return now + interval * (1 + random.uniform(-cls.jitter, cls.jitter))
+
+    @classmethod
+    def group(cls, watches):
+        '''Coalesce the given watches into one request per source list.
+        Watches on all sources cannot be requested without a term, so they are only coalesced with watches of the same term.
+
+        Args:
+            watches: Rows from DB.due_watches.
+
+        Returns:
+            dictionary: The return value. Keys are tuples of the term to request and the sources. Values are lists of watches.
+        '''
+        groups = {}
+        for watch in watches:
+            key = ('', watch[3]) if watch[3] else (watch[2], '')
+            groups.setdefault(key, []).append(watch)
+        return groups
+
+    @classmethod
+    def fetch(cls, term, sources, since):
+        '''Request top headlines page by page until reaching articles published before the given date.
+
+        Args:
+            term: Target term to search for within articles. Empty for every article of the sources.
+            sources: Comma separated list of news source IDs.
+            since: Oldest high-water published date of the watches. None to only request the first page.
+
+        Returns:
+            list: The return value. Articles of the requested pages.
+        '''
+        articles = []
+        for page in range(1, cls.max_pages + 1):
+            res = News.request_page(term, sources, page, cls.page_size, 0)
+            found = [Article.from_json(x) for x in res.get('articles', [])]
+            articles.extend(found)
+            if since is None or len(found) < cls.page_size or len(articles) >= res.get('totalResults', 0):
+                break
+            if min(x.published_at or '' for x in found) < since:
+                break
+        return articles
+
+    @classmethod
+    def matches(cls, term, article):
+        '''Check if every word of the given term appears in the given article.
+
+        Args:
+            term: Target term to search for within articles.
+            article: Target article.
+
+        Returns:
+            boolean: The return value. True if the article matches.
+        '''
+        text = f'{article.title or ""} {article.description or ""} {article.content or ""}'.lower()
+        return all(x in text for x in term.lower().split())
+
+    @classmethod
+    def newer(cls, high_water, urls, articles, term=''):
+        '''Pick the articles published after the given high-water mark and move the mark forward past every fetched article.
+        Articles published exactly at the mark are new unless their URL was already seen at that date.
+
+        Args:
+            high_water: Latest published date seen so far. None if the watch was never polled.
+            urls: Set of URLs published at the high-water date.
+            articles: Fetched articles.
+            term: Only pick articles matching this term. Empty if every fetched article matches.
+
+        Returns:
+            tuple: The return value. List of new articles, new high-water date and set of URLs published at that date. No articles are new on the first poll.
+        '''
+        new = []
+        for article in articles:
+            published = article.published_at
+            if not published or high_water is None:
+                continue
+            if (published > high_water or (published == high_water and article.url not in urls)) and \
+                    (term == '' or cls.matches(term, article)):
+                new.append(article)
+        for article in articles:
+            published = article.published_at
+            if not published:
+                continue
+            if high_water is None or published > high_water:
+                high_water = published
+                urls = set()
+            if published == high_water:
+                urls.add(article.url)
+        if high_water is None:
+            high_water = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        return new, high_water, urls
+
+    @classmethod
+    def poll(cls, user_id=None, force=False):
+        '''Poll the watches that are due, or about to be, and store the articles they found.
+
+        Args:
+            user_id: Only poll the watches of this user ID. None for every user.
+            force: Whether to poll every watch now instead of only the due ones.
+
+        Returns:
+            list: The return value. Tuples of watch ID, user ID and new article.
+        '''
+        now = time.time()
+        until = float('inf') if force else now + cls.coalesce_window
+        found = []
+        for (term, sources), watches in cls.group(DB.due_watches(until, user_id)).items():
+            marks = [x[5] for x in watches]
+            since = None if None in marks else min(marks)
+            try:
+                articles = cls.fetch(term, sources, since)
+            except Exception as err:
+                print(f'Polling {term or sources} failed: {err}', file=sys.stderr)
+                for watch in watches:
+                    DB.record_watch(watch[0], [], watch[5], watch[6],
+                                    cls.next_poll(watch[4], now))
+                continue
+            Trends.ingest(articles)
+            for watch in watches:
+                urls = set(watch[6].split('\n')) if watch[6] else set()
+                new, high_water, urls = cls.newer(
+                    watch[5], urls, articles, '' if term else watch[2])
+                DB.record_watch(watch[0], new, high_water, '\n'.join(sorted(urls)),
+                                cls.next_poll(watch[4], now))
+                found.extend((watch[0], watch[1], x) for x in new)
+        return found
+
+    @classmethod
+    def run(cls, stop, on_new=None):
+        '''Poll watches as they fall due until the given event is set.
+
+        Args:
+            stop: threading.Event that ends the loop.
+            on_new: Function called with each tuple of watch ID, user ID and new article.
+        '''
+        while not stop.is_set():
+            for found in cls.poll():
+                if on_new is not None:
+                    on_new(*found)
+            due = DB.next_poll()
+            wait = cls.max_sleep if due is None else due - time.time()
+            stop.wait(min(max(wait, 1), cls.max_sleep))